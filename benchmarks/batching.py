@@ -0,0 +1,71 @@
+import asyncio
+import statistics
+import sys
+import threading
+import time
+
+import winerp
+
+# Sends bursts of small requests with and without outbound batching, see the batch_window of winerp.Client,
+# and prints the throughput gained against the latency added by the window to a request sent on its own.
+#
+#   python benchmarks/batching.py [requests per burst] [bursts]
+
+BURST = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+BURSTS = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+PORT = 13284
+
+server = winerp.Server(port=PORT, engine="asyncio", queue_size=BURST * 2)
+threading.Thread(target=server.start, daemon=True).start()
+
+
+async def timed(call):
+    start = time.perf_counter()
+    await call
+    return time.perf_counter() - start
+
+
+async def measure(batch_window):
+    label = "unbatched" if batch_window is None else "%.1f ms" % (batch_window * 1000)
+    requester = winerp.Client("requester-%s" % label, port=PORT, batch_window=batch_window)
+    responder = winerp.Client("responder-%s" % label, port=PORT, batch_window=batch_window)
+
+    @responder.route()
+    async def add(source, a=0, b=0):
+        return a + b
+
+    await requester.start()
+    await responder.start()
+    while not (requester.authorized and responder.authorized):
+        await asyncio.sleep(0.01)
+
+    timings = []
+    elapsed = 0
+    for _ in range(BURSTS):
+        start = time.perf_counter()
+        timings += await asyncio.gather(*(
+            timed(requester.request("add", source=responder.local_name, a=index, b=1))
+            for index in range(BURST)
+        ))
+        elapsed += time.perf_counter() - start
+    timings.sort()
+
+    idle = []
+    for index in range(200):
+        idle.append(await timed(requester.request("add", source=responder.local_name, a=index, b=1)))
+    print("%-10s %8.0f requests/s, burst latency median %7.2f ms, p99 %7.2f ms, idle latency median %5.2f ms" % (
+        label,
+        BURST * BURSTS / elapsed,
+        statistics.median(timings) * 1000,
+        timings[int(len(timings) * 0.99)] * 1000,
+        statistics.median(idle) * 1000
+    ))
+
+
+async def main():
+    await asyncio.sleep(0.5)  # Waits for the server to listen
+    for batch_window in (None, 0.0005, 0.002, 0.01):
+        await measure(batch_window)
+
+
+asyncio.run(main())
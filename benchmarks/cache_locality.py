@@ -0,0 +1,89 @@
+import asyncio
+import collections
+import random
+import sys
+import threading
+
+import winerp
+
+# Requests guilds from a worker group whose replicas each keep their own small cache, see the group of
+# winerp.Client, with and without a routing key, and prints the cache hit rate of each.
+# The routing key sends the requests about a guild to the replica holding it, so each replica only caches its
+# own share of the guilds. Then a replica leaves, and the share of the keys moved to another replica is printed.
+#
+#   python benchmarks/cache_locality.py [replicas] [requests]
+
+REPLICAS = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+REQUESTS = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+GUILDS = 2000
+CACHE_SIZE = GUILDS // REPLICAS
+PORT = 13294
+
+server = winerp.Server(port=PORT, engine="asyncio")
+threading.Thread(target=server.start, daemon=True).start()
+# A few guilds get most of the requests
+weights = [1 / (rank + 1) for rank in range(GUILDS)]
+stats = collections.Counter()
+
+
+def replica(index):
+    client = winerp.Client("guilds", port=PORT, reconnect=False, group=True, member="replica-%s" % index)
+    cache = collections.OrderedDict()
+
+    @client.route()
+    async def get_guild(source, guild_id=None):
+        if guild_id in cache:
+            cache.move_to_end(guild_id)
+            stats["hits"] += 1
+        else:
+            cache[guild_id] = {"id": guild_id}
+            if len(cache) > CACHE_SIZE:
+                cache.popitem(last=False)
+            stats["misses"] += 1
+        return client.member
+
+    return client
+
+
+async def run(requester, keyed):
+    stats.clear()
+    guilds = random.choices(range(GUILDS), weights, k=REQUESTS)
+    for start in range(0, REQUESTS, 100):
+        await asyncio.gather(*(
+            requester.request("get_guild", source="guilds", guild_id=guild, routing_key=guild if keyed else None)
+            for guild in guilds[start:start + 100]
+        ))
+    print("%-15s hit rate %5.1f%%" % (
+        "routing key" if keyed else "round robin", stats["hits"] / (stats["hits"] + stats["misses"]) * 100
+    ))
+
+
+async def owners(requester):
+    return await asyncio.gather(*(
+        requester.request("get_guild", source="guilds", guild_id=guild, routing_key=guild) for guild in range(GUILDS)
+    ))
+
+
+async def main():
+    await asyncio.sleep(0.5)  # Waits for the server to listen
+    requester = winerp.Client("requester", port=PORT)
+    replicas = [replica(index) for index in range(REPLICAS)]
+    for client in (requester, *replicas):
+        await client.start()
+    while not all(client.authorized for client in (requester, *replicas)):
+        await asyncio.sleep(0.01)
+
+    await run(requester, keyed=False)
+    await run(requester, keyed=True)
+
+    before = await owners(requester)
+    await replicas[-1].websocket.close()
+    await asyncio.sleep(0.5)
+    after = await owners(requester)
+    moved = sum(1 for old, new in zip(before, after) if old != new)
+    print("%-15s %5.1f%% of the keys moved, %5.1f%% were held by the replica which left" % (
+        "replica left", moved / GUILDS * 100, before.count(replicas[-1].member) / GUILDS * 100
+    ))
+
+
+asyncio.run(main())
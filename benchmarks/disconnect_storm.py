@@ -0,0 +1,56 @@
+import sys
+import time
+
+import winerp
+from winerp.lib import envelope
+from winerp.lib.outbox import Outbox
+
+# Connects, verifies and disconnects simulated clients by calling the callbacks
+# the asyncio engine calls for real connections, so no socket is opened.
+# Every local name is connected twice, the second connection is put on hold
+# and promoted when the first one leaves, like a mass reconnect after a network blip.
+#
+#   python benchmarks/disconnect_storm.py [clients]
+
+CLIENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+server = winerp.Server(engine="asyncio")
+engine = server.websocket
+
+
+def connect(connection_id, name):
+    client = {"id": connection_id, "handler": None, "address": ("127.0.0.1", 0), "outbox": Outbox(1024, lambda: None)}
+    engine.new_client(client, engine)
+    verification = {"type": 1, "id": name, "uuid": str(connection_id), "data": {"codec": "json"}}
+    engine.message_received(client, engine, envelope.encode(verification).decode("utf-8"))
+    return client
+
+
+def storm(clients):
+    names = ["bot-%s" % index for index in range(clients)]
+    start = time.perf_counter()
+    active = [connect(index, name) for index, name in enumerate(names)]
+    on_hold = [connect(clients + index, name) for index, name in enumerate(names)]
+    connected = time.perf_counter()
+
+    for client in active:
+        engine.client_left(client, engine)
+    promoted = time.perf_counter()
+    assert len(server.active_clients) == clients and not server.on_hold_connections
+
+    for client in on_hold:
+        engine.client_left(client, engine)
+    left = time.perf_counter()
+    assert not server.active_clients
+
+    print("%6s clients: connect %7.1f us, promote %7.1f us, disconnect %7.1f us per connection" % (
+        clients,
+        (connected - start) / (2 * clients) * 1e6,
+        (promoted - connected) / clients * 1e6,
+        (left - promoted) / clients * 1e6
+    ))
+
+
+# The cost per connection stays flat as the number of clients grows
+for count in (CLIENTS // 100, CLIENTS // 10, CLIENTS):
+    storm(count)
@@ -0,0 +1,41 @@
+import sys
+import time
+
+import winerp
+from winerp.lib import envelope
+from winerp.lib.outbox import Outbox
+
+# Broadcasts informs of growing sizes to simulated clients, by calling the callbacks
+# the asyncio engine calls for real connections, and times the server side of the fan-out.
+# The body of an inform is encoded once whatever the number of recipients,
+# so the cost per recipient stays flat as the payload grows.
+#
+#   python benchmarks/inform_fanout.py [recipients] [rounds]
+
+RECIPIENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+ROUNDS = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+server = winerp.Server(engine="asyncio", queue_size=ROUNDS + 1)
+engine = server.websocket
+clients = []
+
+for index in range(RECIPIENTS + 1):
+    client = {"id": index, "handler": None, "address": ("127.0.0.1", 0), "outbox": Outbox(ROUNDS + 1, lambda: None)}
+    engine.new_client(client, engine)
+    verification = {"type": 1, "id": "bot-%s" % index, "uuid": str(index), "data": {"codec": "json"}}
+    engine.message_received(client, engine, envelope.encode(verification).decode("utf-8"))
+    clients.append(client)
+
+sender = clients[0]
+for size in (1024, 10240, 102400, 512000):
+    frame = envelope.encode({"type": 6, "id": "bot-0", "uuid": None, "data": {"status": "x" * size}})
+    for client in clients:
+        client["outbox"].frames.clear()
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        engine.message_received(sender, engine, frame)
+    elapsed = (time.perf_counter() - start) / ROUNDS
+    assert all(len(client["outbox"]) == ROUNDS for client in clients[1:])
+    print("%7s bytes to %s clients: %8.1f us per inform, %5.2f us per recipient" % (
+        size, RECIPIENTS, elapsed * 1e6, elapsed / RECIPIENTS * 1e6
+    ))
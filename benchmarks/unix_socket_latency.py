@@ -0,0 +1,65 @@
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import winerp
+
+# Compares the round trips of pings and requests through TCP loopback and through a unix socket,
+# both served by the same asyncio server.
+#
+#   python benchmarks/unix_socket_latency.py [round trips]
+
+ROUND_TRIPS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+PORT = 13274
+SOCKET_PATH = os.path.join(tempfile.mkdtemp(), "winerp.sock")
+
+server = winerp.Server(port=PORT, engine="asyncio", socket_path=SOCKET_PATH)
+threading.Thread(target=server.start, daemon=True).start()
+
+
+def report(transport, kind, timings):
+    timings.sort()
+    print("%-4s %-7s median %6.1f us, p99 %6.1f us" % (
+        transport, kind, statistics.median(timings) * 1e6, timings[int(len(timings) * 0.99)] * 1e6
+    ))
+
+
+async def measure(transport, **endpoint):
+    requester = winerp.Client("requester-%s" % transport, **endpoint)
+    responder = winerp.Client("responder-%s" % transport, **endpoint)
+
+    @responder.route()
+    async def echo(source, value=None):
+        return value
+
+    await requester.start()
+    await responder.start()
+    while not (requester.authorized and responder.authorized):
+        await asyncio.sleep(0.01)
+
+    for kind, call in (
+            ("ping", lambda: requester.ping()),
+            ("request", lambda: requester.request("echo", source=responder.local_name, value="x" * 64))
+    ):
+        # Warms up the connections first
+        for _ in range(100):
+            await call()
+        timings = []
+        for _ in range(ROUND_TRIPS):
+            start = time.perf_counter()
+            await call()
+            timings.append(time.perf_counter() - start)
+        report(transport, kind, timings)
+
+
+async def main():
+    await asyncio.sleep(0.5)  # Waits for the server to listen
+    await measure("tcp", port=PORT)
+    await measure("unix", socket_path=SOCKET_PATH)
+
+
+asyncio.run(main())
@@ -0,0 +1,53 @@
+import base64
+import sys
+import timeit
+
+from winerp.lib import binary, envelope
+
+# Compares the encoding and the decoding of typical messages with the JSON envelope and the msgpack codec,
+# see winerp.lib.envelope and winerp.lib.binary. Requires msgpack.
+#
+#   python benchmarks/wire_codecs.py [iterations]
+
+ITERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+if binary.msgpack is None:
+    sys.exit("msgpack is not installed")
+
+HEADER = {"type": 3, "id": "bot-1", "destination": "bot-2", "uuid": "3f2c1e0a-8d5b-4a7e-9c61-2b7d0f4e8a19", "route": "get_guild"}
+MEMBERS = [{"id": 80351110224678912 + index, "name": "member-%s" % index, "roles": [1, 2, 3], "bot": False} for index in range(100)]
+BLOB = bytes(range(256)) * 256
+
+MESSAGES = {
+    "ping": {**HEADER, "type": 5, "data": {"success": True}},
+    "request": {**HEADER, "type": 2, "data": {"guild_id": 80351110224678912}},
+    "response": {**HEADER, "data": {"id": 80351110224678912, "members": MEMBERS}, "traceback": None, "pseudo_object": False},
+    # JSON can't hold bytes, they are sent as base64 strings
+    "64 KiB bytes": {**HEADER, "data": {"avatar": BLOB}, "traceback": None, "pseudo_object": False},
+}
+
+
+def as_json(message):
+    data = message["data"]
+    if isinstance(data.get("avatar"), bytes):
+        message = {**message, "data": {"avatar": base64.b64encode(data["avatar"]).decode("ascii")}}
+    return message
+
+
+for name, message in MESSAGES.items():
+    json_message = as_json(message)
+    json_frame = envelope.encode(json_message)
+    binary_frame = binary.encode(message)
+    assert binary.decode(binary_frame) == message
+    results = []
+    for codec, encode, decode, payload, frame in (
+            ("json", envelope.encode, envelope.decode, json_message, json_frame),
+            ("msgpack", binary.encode, binary.decode, message, binary_frame)
+    ):
+        encoding = timeit.timeit(lambda: encode(payload), number=ITERATIONS) / ITERATIONS
+        decoding = timeit.timeit(lambda: decode(frame), number=ITERATIONS) / ITERATIONS
+        results.append("%-7s %7s bytes, encode %7.2f us, decode %7.2f us" % (
+            codec, len(frame), encoding * 1e6, decoding * 1e6
+        ))
+    print("%-12s %s" % (name, results[0]))
+    print("%-12s %s" % ("", results[1]))
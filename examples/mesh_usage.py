@@ -0,0 +1,33 @@
+import asyncio
+import threading
+
+import winerp
+
+# Two servers of a mesh, both on loopback. On real deployments each server runs
+# on its own host, e.g. `winerp --port 13254 --engine asyncio --mesh-port 13255 --peer other-host:13255`
+# To test a mesh of any size on a single host, see winerp.lib.harness.LoopbackMesh
+server_a = winerp.Server(port=13254, engine="asyncio", mesh_port=13255)
+server_b = winerp.Server(port=13264, engine="asyncio", peers=["127.0.0.1:13255"])
+
+for server in (server_a, server_b):
+    threading.Thread(target=server.start, daemon=True).start()
+
+client_a = winerp.Client(local_name="bot-a", port=13254)
+client_b = winerp.Client(local_name="bot-b", port=13264)
+
+
+@client_b.route()
+async def get_formatted_data(source, user_id=None):
+    return f"<@{user_id}> requested by {source}"
+
+
+async def main():
+    await client_a.start()
+    await client_b.start()
+    await asyncio.sleep(2)  # Waits for the servers to link
+
+    # bot-a and bot-b are connected to different servers, the request goes through the mesh
+    print(await client_a.request("get_formatted_data", source="bot-b", user_id=123))
+
+
+asyncio.run(main())
@@ -7,6 +7,15 @@ extras = {
         'sphinxcontrib-websupport',
         'typing-extensions',
     ],
+    'speed': [
+        'uvloop',
+    ],
+    'msgpack': [
+        'msgpack',
+    ],
+    'zstd': [
+        'zstandard',
+    ],
 }
 
 setup(
@@ -43,6 +52,6 @@ setup(
             ]
         },
     install_requires=["websockets", "websocket-server", "orjson"],
-    extra_requires=extras,
+    extras_require=extras,
     python_requires=">=3.6",
 )
@@ -0,0 +1,56 @@
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+
+import winerp
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def connect(*clients: winerp.Client, timeout: float = 10):
+    """
+    Starts the clients and waits until the server authorized all of them.
+    """
+    for client in clients:
+        await client.start()
+    deadline = time.monotonic() + timeout
+    while not all(client.authorized for client in clients):
+        if time.monotonic() > deadline:
+            raise TimeoutError("The clients are not authorized after %s seconds" % timeout)
+        await asyncio.sleep(0.01)
+
+
+@pytest.fixture(params=["asyncio", "threaded"])
+def engine(request):
+    """
+    The engine of the :func:`server`, a test module overrides it to run against a single engine.
+    """
+    return request.param
+
+
+@pytest.fixture
+def server(engine):
+    """
+    A server running ``engine`` on a free loopback port, stopped after the test.
+    """
+    server = winerp.Server(host="127.0.0.1", port=free_port(), engine=engine)
+    thread = threading.Thread(target=server.start, daemon=True)
+    thread.start()
+    if engine == "asyncio":
+        deadline = time.monotonic() + 10
+        while not server.websocket.listening:
+            assert time.monotonic() < deadline, "The server is not listening"
+            time.sleep(0.01)
+    yield server
+    if engine == "asyncio":
+        server.websocket.stop()
+    else:
+        server.websocket.shutdown_gracefully()
+    thread.join(5)
@@ -0,0 +1,52 @@
+import asyncio
+
+import winerp
+from winerp.lib.harness import LoopbackMesh
+
+from .conftest import connect
+
+
+def test_coalesced_response_through_shared_memory(server):
+    port = server.websocket.port
+    provider = winerp.Client("provider", port=port, reconnect=False, shared_memory_threshold=1024)
+    requesters = [winerp.Client("requester-%s" % index, port=port, reconnect=False) for index in range(3)]
+    calls = []
+
+    @provider.route(coalesce=True)
+    async def config(source):
+        calls.append(source)
+        await asyncio.sleep(0.2)
+        return "x" * 65536
+
+    async def main():
+        await connect(provider, *requesters)
+        return await asyncio.gather(*(requester.request("config", "provider", timeout=5) for requester in requesters))
+
+    # Every waiter maps the segment, none of them unlinks it before the others
+    assert asyncio.run(main()) == ["x" * 65536] * 3
+    assert len(calls) == 1
+
+
+def test_requests_forwarded_by_peers_are_coalesced():
+    with LoopbackMesh(2) as mesh:
+        provider = winerp.Client("provider", port=mesh.ports[0], reconnect=False)
+        requesters = [
+            winerp.Client("requester-%s" % index, port=mesh.ports[index % 2], reconnect=False)
+            for index in range(4)
+        ]
+        calls = []
+
+        @provider.route(coalesce=True)
+        async def config(source):
+            calls.append(source)
+            await asyncio.sleep(0.2)
+            return {"prefix": "!"}
+
+        async def main():
+            await connect(provider, *requesters)
+            while any(requester.local_name not in mesh.servers[0].cluster.locations for requester in requesters[1::2]):
+                await asyncio.sleep(0.01)
+            return await asyncio.gather(*(requester.request("config", "provider", timeout=5) for requester in requesters))
+
+        assert asyncio.run(main()) == [{"prefix": "!"}] * 4
+        assert len(calls) == 1
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+import winerp
+
+from .conftest import connect
+
+pytest.importorskip("msgpack")
+
+
+@pytest.fixture
+def engine():
+    # Only the asyncio engine serves binary frames
+    return "asyncio"
+
+
+def test_msgpack_map_keys_reach_json_clients(server):
+    port = server.websocket.port
+    provider = winerp.Client("provider", port=port, reconnect=False, codec="msgpack")
+    requester = winerp.Client("requester", port=port, reconnect=False)
+
+    @provider.route()
+    async def members(source, guild_ids):
+        return {guild_id: "member" for guild_id in guild_ids}
+
+    async def main():
+        await connect(provider, requester)
+        return await requester.request("members", "provider", timeout=5, guild_ids=[1, 2])
+
+    assert asyncio.run(main()) == {"1": "member", "2": "member"}
+
+
+def test_message_which_cannot_be_encoded_fails_the_request(server):
+    port = server.websocket.port
+    provider = winerp.Client("provider", port=port, reconnect=False, codec="msgpack")
+    requester = winerp.Client("requester", port=port, reconnect=False)
+
+    @provider.route()
+    async def blob(source):
+        return {b"raw": 1}
+
+    async def main():
+        await connect(provider, requester)
+        with pytest.raises(winerp.ClientRuntimeError, match="can't be encoded"):
+            await requester.request("blob", "provider", timeout=5)
+        # The connection of the provider is kept
+        assert await requester.ping("provider")
+
+    asyncio.run(main())
+
+
+def test_invalid_compression_threshold_falls_back_to_default(server):
+    port = server.websocket.port
+    receiver = winerp.Client("receiver", port=port, reconnect=False, compression="zlib")
+    sender = winerp.Client("sender", port=port, reconnect=False)
+    # Sent as is in the verification, the client itself only validates the number
+    receiver.compression_threshold = "large"
+    received = asyncio.Event()
+
+    @receiver.event
+    async def on_winerp_information(data, source):
+        received.set()
+
+    async def main():
+        await connect(receiver, sender)
+        await sender.inform({"blob": "x" * 65536}, ["receiver"])
+        await asyncio.wait_for(received.wait(), 5)
+
+    asyncio.run(main())
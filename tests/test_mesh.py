@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+import winerp
+from winerp.lib.harness import LoopbackMesh
+
+from .conftest import connect
+
+
+async def located(mesh, *names, timeout: float = 5):
+    # Waits until every server knows where the names are connected
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not all(
+        name in server.active_clients or name in server.cluster.locations
+        for server in mesh.servers
+        for name in names
+    ):
+        assert loop.time() < deadline, "The names are not known to every server"
+        await asyncio.sleep(0.01)
+
+
+def test_messages_are_forwarded_across_peers():
+    with LoopbackMesh(3) as mesh:
+        first = winerp.Client("first", port=mesh.ports[0], reconnect=False)
+        last = winerp.Client("last", port=mesh.ports[2], reconnect=False)
+        received = []
+
+        @last.route()
+        async def echo(source, value):
+            return [source, value]
+
+        @last.event
+        async def on_winerp_information(data, source):
+            received.append(len(data))
+
+        async def main():
+            await connect(first, last)
+            await located(mesh, "first", "last")
+            assert await first.request("echo", "last", timeout=5, value=1) == ["first", 1]
+            # Large frames back up the peer link, they are all sent once it drains
+            for _ in range(20):
+                await first.inform("x" * 262144, ["last"])
+            for _ in range(500):
+                if len(received) == 20:
+                    break
+                await asyncio.sleep(0.01)
+
+        asyncio.run(main())
+        assert received == [262144] * 20
+
+
+def test_peer_leaving_drops_its_clients():
+    with LoopbackMesh(3) as mesh:
+        first = winerp.Client("first", port=mesh.ports[0], reconnect=False)
+        second = winerp.Client("second", port=mesh.ports[1], reconnect=False)
+        last = winerp.Client("last", port=mesh.ports[2], reconnect=False)
+
+        @second.route()
+        async def hello(source):
+            return "second"
+
+        @last.route()
+        async def bye(source):
+            return "last"
+
+        async def main():
+            await connect(first, second, last)
+            await located(mesh, "first", "second", "last")
+
+            await asyncio.to_thread(mesh.stop_server, 2)
+            remaining = mesh.servers[:2]
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + 5
+            while any(len(server.cluster.peers) != 1 or "last" in server.cluster.locations for server in remaining):
+                assert loop.time() < deadline, "The servers did not notice the peer left"
+                await asyncio.sleep(0.01)
+
+            with pytest.raises(winerp.ClientRuntimeError, match="Destination not found."):
+                await first.request("bye", "last", timeout=5)
+            # The link between the remaining servers is still used
+            assert await first.request("hello", "second", timeout=5) == "second"
+
+        asyncio.run(main())
@@ -0,0 +1,44 @@
+import asyncio
+import gc
+
+import winerp
+
+from .conftest import connect
+
+
+def test_stream_left_early(server):
+    port = server.websocket.port
+    producer = winerp.Client("producer", port=port, reconnect=False)
+    consumer = winerp.Client("consumer", port=port, reconnect=False)
+    produced = []
+    closed = asyncio.Event()
+
+    @producer.route()
+    async def numbers(source):
+        try:
+            for number in range(1000):
+                produced.append(number)
+                yield number
+        finally:
+            closed.set()
+
+    async def main():
+        errors = []
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+        await connect(producer, consumer)
+        received = []
+        async for number in consumer.stream("numbers", "producer", timeout=5, window=256):
+            received.append(number)
+            if len(received) == 3:
+                break
+        await asyncio.wait_for(closed.wait(), 5)
+        # The responses which were still in flight are dropped without raising
+        await asyncio.sleep(0.5)
+        gc.collect()
+        await asyncio.sleep(0)
+        return received, errors
+
+    received, errors = asyncio.run(main())
+    assert received == [0, 1, 2]
+    assert errors == []
+    assert len(produced) < 1000
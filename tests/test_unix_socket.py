@@ -0,0 +1,46 @@
+import asyncio
+import errno
+import os
+import socket
+
+import pytest
+
+from winerp.lib.aioserver import AsyncWebsocketServer
+
+from .conftest import free_port
+
+
+def serve(path):
+    server = AsyncWebsocketServer(port=free_port(), unix_path=path)
+
+    async def main():
+        task = asyncio.ensure_future(server.serve_forever())
+        while not server.listening and not task.done():
+            await asyncio.sleep(0.01)
+        server.stop()
+        await task
+
+    asyncio.run(main())
+
+
+def test_stale_socket_is_replaced(tmp_path):
+    path = str(tmp_path / "winerp.sock")
+    # A socket bound by a process which is gone, nothing accepts connections on it
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()
+    serve(path)
+
+
+def test_socket_of_live_server_is_kept(tmp_path):
+    path = str(tmp_path / "winerp.sock")
+    live = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    live.bind(path)
+    live.listen()
+    try:
+        with pytest.raises(OSError) as error:
+            serve(path)
+        assert error.value.errno == errno.EADDRINUSE
+        assert os.path.exists(path)
+    finally:
+        live.close()
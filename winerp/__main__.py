@@ -14,6 +14,87 @@ def run():
         default=13254
     )
 
+    parser.add_argument(
+        "--engine",
+        choices=["threaded", "asyncio"],
+        help="The engine used to serve the connections",
+        default="threaded"
+    )
+
+    parser.add_argument(
+        "--uvloop",
+        action="store_true",
+        help="run the asyncio engine on uvloop"
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="The number of worker processes, requires the asyncio engine",
+        default=1
+    )
+
+    parser.add_argument(
+        "--mesh-port",
+        type=int,
+        help="The port accepting links from the other servers of a mesh",
+        default=None
+    )
+
+    parser.add_argument(
+        "--peer",
+        action="append",
+        help="The address (host:port) of another server of the mesh, can be repeated",
+        default=[]
+    )
+
+    parser.add_argument(
+        "--socket-path",
+        help="The path of a unix socket to listen on as well, requires the asyncio engine",
+        default=None
+    )
+
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        help="The number of frames which can be queued for a client",
+        default=1024
+    )
+
+    parser.add_argument(
+        "--overflow",
+        choices=["reject", "drop", "disconnect"],
+        help="What happens to requests and informs for a client whose queue is full",
+        default="reject"
+    )
+
+    parser.add_argument(
+        "--metrics-interval",
+        type=float,
+        help="Dump the metrics of the server every given number of seconds",
+        default=None
+    )
+
+    parser.add_argument(
+        "--metrics-path",
+        help="The file the metrics are dumped to in the Prometheus text format, stdout if not set",
+        default=None
+    )
+
+    parser.add_argument(
+        "--balancing",
+        choices=["round_robin", "least_outstanding"],
+        help="How the requests to a worker group are spread across its replicas",
+        default="round_robin"
+    )
+
+    parser.add_argument(
+        "--resume-timeout",
+        type=float,
+        help="The number of seconds the session of a lost client is held for it to resume, 0 to disable",
+        default=30
+    )
+
     parser.add_argument(
         "--version",
         action="store_true",
@@ -32,7 +113,21 @@ def run():
         print('winerp version: unknown')
     else:
         print("Starting server at port: ", port)
-        server = Server(port=port)
+        server = Server(
+            port=port,
+            engine=args.engine,
+            uvloop=args.uvloop,
+            workers=args.workers,
+            mesh_port=args.mesh_port,
+            peers=args.peer,
+            socket_path=args.socket_path,
+            queue_size=args.queue_size,
+            overflow=args.overflow,
+            metrics_interval=args.metrics_interval,
+            metrics_path=args.metrics_path,
+            balancing=args.balancing,
+            resume_timeout=args.resume_timeout
+        )
         server.start()
 
 
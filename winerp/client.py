@@ -4,7 +4,10 @@ for inter-communication between your processes or discord.py bots.
 """
 # pylint: disable=E0401,W0718,C0301
 import asyncio
+import functools
+import inspect
 import logging
+import random
 import traceback
 import typing
 import uuid
@@ -13,6 +16,8 @@ from typing import (
     Any,
     Callable,
     Coroutine,
+    List,
+    Tuple,
     TypeVar,
     Union,
 )
@@ -28,6 +33,9 @@ from .lib.errors import (
     MissingUUIDError,
     UUIDNotFoundError,
 )
+from .lib import binary, chunks, envelope, sessions, shm, streams, topics
+from .lib import compression as compression_
+from .lib.cache import ResponseCache
 from .lib.events import Events
 from .lib.message import WsMessage
 from .lib.payload import Payloads, MessagePayload, winerpObject, responseObject
@@ -50,8 +58,80 @@ class Client:
     port: Optional[:class:`int`]
         The port on which the server is running. Defaults to 13254.
     reconnect: Optional[:class:`bool`]
-        If set to True, the client will automatically try to reconnect to the winerp server
-        every 60 seconds (default). This option is set to True by default.
+        If set to True, the client will automatically try to reconnect to the winerp server,
+        see ``reconnect_delay``. This option is set to True by default.
+    socket_path: Optional[:class:`str`]
+        The path of the unix socket of a server running on the same host.
+        If set, the client connects to it instead of ``host`` and ``port``.
+    shared_memory_threshold: Optional[:class:`int`]
+        The size in bytes above which the data of a message, once encoded, is written to a shared memory segment,
+        only a small handle is sent through the server. The smaller messages are sent as usual. Defaults to None, shared memory is not used.
+        This should only be set if every client exchanging data with this one runs on the same host.
+        Messages sent through shared memory are always received, whatever this option is set to.
+    shared_memory_ttl: Optional[:class:`float`]
+        The time in seconds after which a shared memory segment created by this client is unlinked,
+        whether it was picked up or not. Defaults to 30.
+    codec: Optional[:class:`str`]
+        The codec asked to the server during the verification, either ``json`` (default) or ``msgpack``.
+        The binary ``msgpack`` codec tags the fields with integers and sends ``bytes`` as-is,
+        it requires ``msgpack`` to be installed. The client falls back to ``json`` if the server can't serve it.
+        Clients using different codecs can still exchange messages, ``bytes`` are received as base64 strings
+        by the clients using ``json``. Messages sent through shared memory are always encoded to JSON.
+    compression: Optional[:class:`str`]
+        The algorithm used to compress the data of the large messages, either ``zlib`` or ``zstd``.
+        ``zstd`` requires ``zstandard`` to be installed. Defaults to None, messages are not compressed.
+        The compression is negotiated with the server during the verification, the client sends and receives
+        compressed messages only if the server accepts it.
+    compression_threshold: Optional[:class:`int`]
+        The size in bytes above which the data of a message is compressed. Defaults to 16384,
+        so the small messages do not pay for the compression.
+    chunk_size: Optional[:class:`int`]
+        The size in bytes above which the data of a message, once encoded and compressed, is split into chunks,
+        sent in their own frames and reassembled by the receiver, see :mod:`winerp.lib.chunks`. Defaults to 1 MiB.
+        A chunk is larger than ``chunk_size`` once encoded, this should stay well below :attr:`max_data_size`.
+        The messages are only chunked if the server takes part in chunked transfers.
+    max_reassembly_size: Optional[:class:`int`]
+        The number of bytes which can be buffered for the incomplete chunked messages received by this client.
+        Defaults to 64 MiB.
+    chunk_timeout: Optional[:class:`float`]
+        The time in seconds after which an incomplete chunked message is dropped. Defaults to 30.
+    batch_window: Optional[:class:`float`]
+        The time in seconds during which the messages sent by this client are collected and sent
+        to the server in a single frame, which the server unpacks. Defaults to None, every message is sent at once.
+        With ``0``, the messages sent during the same iteration of the event loop are batched together.
+        A message waits at most ``batch_window`` before being sent, so this trades latency for throughput
+        under bursts of small messages. The server routes the messages of a batch at once,
+        so a burst fills the queue of its destination sooner, see the ``queue_size`` of :class:`~winerp.server.Server`.
+    batch_size: Optional[:class:`int`]
+        The size in bytes above which a batch is sent without waiting for the end of ``batch_window``.
+        Messages larger than ``batch_size`` are sent on their own. Defaults to 65536.
+    cache_size: Optional[:class:`int`]
+        The number of responses held by :attr:`cache`, see the ``cache_ttl`` of :meth:`request`. Defaults to 1024.
+    coalesce_routes: Optional[List[:class:`str`]]
+        The routes whose identical concurrent requests are coalesced, see the ``coalesce`` of :meth:`request`.
+    group: Optional[:class:`bool`]
+        If set to True, the client joins a worker group with the other clients of the same local name
+        which set it, instead of being put on hold while one of them is connected. All of them are active,
+        and the server spreads the requests to the local name across them, see :mod:`winerp.lib.groups`.
+        Their routes should be the same. Defaults to False.
+    member: Optional[:class:`str`]
+        The identity of this client in its worker group, which places it on the hash ring of the routing keys,
+        see the ``routing_key`` of :meth:`request`. A client reconnecting with the same identity owns the same keys.
+        Defaults to None, the identity of the connection.
+    shards: Optional[List[Any]]
+        The routing keys owned by this client in its worker group, like the ids of the shards it runs.
+        They are sent to this client rather than to the replica picked by consistent hashing.
+    reconnect_delay: Optional[:class:`float`]
+        The base delay in seconds between two attempts to reconnect. The first attempt is immediate,
+        then the delay doubles after each failed attempt up to ``reconnect_threshold``.
+        Each delay is picked at random between 0 and its bound, so the clients of a restarted server
+        don't reconnect all at once. Defaults to 0.5.
+    reconnect_threshold: Optional[:class:`float`]
+        The maximum delay in seconds between two attempts to reconnect. Defaults to 60.
+
+        When it reconnects, the client resumes its session if the server still holds it:
+        it keeps its subscriptions and receives the responses sent to it while it was disconnected,
+        see the ``resume_timeout`` of :class:`~winerp.server.Server`.
     """
 
     def __init__(
@@ -59,17 +139,93 @@ class Client:
             local_name: str,
             host: str = "localhost",
             port: int = 13254,
-            reconnect: bool = True
+            reconnect: bool = True,
+            socket_path: str = None,
+            shared_memory_threshold: int = None,
+            shared_memory_ttl: float = 30,
+            codec: str = binary.JSON,
+            compression: str = None,
+            compression_threshold: int = 16384,
+            chunk_size: int = 1048576,
+            max_reassembly_size: int = 67108864,
+            chunk_timeout: float = 30,
+            batch_window: float = None,
+            batch_size: int = 65536,
+            cache_size: int = 1024,
+            coalesce_routes: List[str] = None,
+            group: bool = False,
+            member: str = None,
+            shards: List[Any] = None,
+            reconnect_delay: float = 0.5,
+            reconnect_threshold: float = 60
     ):
+        if codec not in binary.CODECS:
+            raise ValueError("codec should be either 'json' or 'msgpack'")
+        if codec == binary.MSGPACK and binary.msgpack is None:
+            raise RuntimeError("msgpack is not installed")
+        if compression is not None and compression not in compression_.ALGORITHMS:
+            raise ValueError("compression should be either 'zlib' or 'zstd'")
+        if compression is not None and compression not in compression_.available():
+            raise RuntimeError("zstandard is not installed")
+        if compression_threshold < 0:
+            raise ValueError("compression_threshold should not be negative")
+        if batch_window is not None and batch_window < 0:
+            raise ValueError("batch_window should not be negative")
         self.uri: str = f"ws://{host}:{port}"
+        self.socket_path: str = socket_path
         self.local_name: str = local_name
         self.reconnect: bool = reconnect
-        self.reconnect_threshold: int = 60
+        self.reconnect_delay: float = reconnect_delay
+        self.reconnect_threshold: float = reconnect_threshold
+        # The token sent by the server to resume the session of this client, see winerp.lib.sessions
+        self.__resume_token = None
         self.max_data_size: float = 2  # MiB
         self.websocket = None
+        self.codec: str = codec
+        self.compression: str = compression
+        self.compression_threshold: int = compression_threshold
+        # The codec and the compression accepted by the server, JSON without compression until the client is authorized
+        self.__wire_codec = binary.JSON
+        self.__wire_compression = None
+        self.batch_window: float = batch_window
+        self.batch_size: int = batch_size
+        # Whether the messages are batched, only once the server accepted it
+        self.__wire_batching = False
+        # Whether the large messages are chunked, only once the server accepted it
+        self.__wire_chunks = False
+        self.__batch = []
+        self.__batch_bytes = 0
+        self.__batch_timer = None
+        self.__flush_pending = False
+        self.cache: ResponseCache = ResponseCache(cache_size)
+        self.coalesce_routes: set = set(coalesce_routes or ())
+        self.group: bool = group
+        self.member: str = member
+        self.shards: list = list(shards or ())
+        # request key -> task of the request sent for the identical concurrent requests
+        self.__in_flight = {}
         self.__routes = {}
+        # routes whose identical requests from different clients are coalesced by the server
+        self.__coalescible = set()
+        # routes whose requests the server may send again to another client taking the place of this one
+        self.__idempotent = set()
         self.__sub_routes = {}
+        # topic patterns this client subscribed to, sent again whenever it is authorized
+        self.__topics = set()
+        # topic patterns the server knows this client subscribed to
+        self.__subscribed = set()
         self.listeners = {}
+        # uuid -> queue of the responses of a stream consumed by this client
+        self.__streams = {}
+        # uuids of the streams left early by their consumer, whose responses still in flight are dropped
+        self.__closed_streams = set()
+        # uuid -> credits of a stream produced by a route of this client
+        self.__credits = {}
+        self.__shared_memory = None
+        if shared_memory_threshold is not None:
+            self.__shared_memory = shm.SharedMemoryChannel(shared_memory_threshold, shared_memory_ttl)
+        self.chunk_size: int = chunk_size
+        self.__reassembler = chunks.Reassembler(max_reassembly_size, chunk_timeout, self.__on_chunks_expired)
 
         self._authorized: bool = False
         self._on_hold = False
@@ -96,16 +252,124 @@ class Client:
         if not isinstance(data, WsMessage):
             data = data.__dict__
         logger.debug(data)
-        await self.websocket.send(orjson.dumps(data).decode("utf-8"))
+        # The body is encoded once, whether it is batched, moved to shared memory or split into chunks
+        header, body = self.__encode_body(data)
+        if self.__shared_memory is not None and len(body) > self.__shared_memory.threshold:
+            # Only a small handle goes through the server
+            await self.__send(self.__join(header, self.__shared_memory.share(header, body), False))
+            return
+        if self.__wire_batching and len(body) < self.batch_size and self.__queue(self.__join(header, body, False)):
+            return
+
+        # The chunks hold pieces of the frame the body would be sent in
+        body = self.__compress(body)
+        pieces = None
+        if self.__wire_chunks:
+            pieces = chunks.split(header, body, self.chunk_size, text=self.__wire_codec != binary.MSGPACK)
+        if pieces is None:
+            await self.__send(self.__join(header, body, self.__wire_compression is not None))
+            return
+        for piece in pieces:
+            await self.__send(self.__encode(piece, compress=False))
+            # Lets the other messages through between two chunks
+            await asyncio.sleep(0)
+
+    async def __send(self, frame):
+        if self.__wire_batching and self.__queue(frame):
+            return
+        # The pending batch is sent first, so the messages keep their order
+        if self.__batch:
+            await self.__flush_batch()
+        await self.websocket.send(frame)
+
+    def __queue(self, frame) -> bool:
+        # Adds a frame to the batch, returns False if it is too large to be batched
+        if len(frame) >= self.batch_size:
+            return False
+        self.__batch.append(frame)
+        self.__batch_bytes += len(frame)
+        if self.__batch_bytes >= self.batch_size:
+            self.__schedule_flush()
+        elif self.__batch_timer is None and not self.__flush_pending:
+            self.__batch_timer = asyncio.get_running_loop().call_later(self.batch_window, self.__schedule_flush)
+        return True
+
+    def __schedule_flush(self):
+        if self.__batch_timer is not None:
+            self.__batch_timer.cancel()
+            self.__batch_timer = None
+        if not self.__flush_pending:
+            self.__flush_pending = True
+            asyncio.create_task(self.__flush_batch())
+
+    async def __flush_batch(self):
+        # The frames are taken when the batch is sent, so a scheduled flush sends every frame queued until then
+        frames = self.__batch
+        self.__batch, self.__batch_bytes, self.__flush_pending = [], 0, False
+        if self.__batch_timer is not None:
+            self.__batch_timer.cancel()
+            self.__batch_timer = None
+        if frames:
+            await self.websocket.send(self.__encode({"type": Payloads.batch, "id": self.local_name, "data": frames}))
+
+    def __encode(self, data, compress=True):
+        header, body = self.__encode_body(data)
+        if compress:
+            body = self.__compress(body)
+        return self.__join(header, body, compress and self.__wire_compression is not None)
+
+    def __encode_body(self, data):
+        header, body = envelope.partition(data)
+        if self.__wire_codec == binary.MSGPACK:
+            return header, binary.pack_body(body)
+        return header, orjson.dumps(body)
+
+    def __compress(self, body):
+        if self.__wire_compression is not None and len(body) > self.compression_threshold:
+            return compression_.compress(body, self.__wire_compression)
+        return body
+
+    def __join(self, header, body, binary_frame):
+        if isinstance(body, binary.Packed):
+            return binary.join(header, body)
+        frame = envelope.join(header, body)
+        # Frames holding binary data are sent as binary websocket messages
+        return frame if binary_frame else frame.decode("utf-8")
+
+    def __decode(self, frame):
+        header, body = binary.split(frame) if binary.is_binary(frame) else envelope.split(frame)
+        if body is None:
+            return header
+        if compression_.algorithm_of(body) is not None:
+            body = compression_.decompress(body)
+        header.update(binary.unpack_body(body) if isinstance(body, binary.Packed) else orjson.loads(body))
+        return header
 
     def __send_message(self, data):
+        # A small message joins the batch at once, without a task
+        if self.__wire_batching:
+            header, body = self.__encode_body(data if isinstance(data, WsMessage) else data.__dict__)
+            shared = self.__shared_memory is not None and len(body) > self.__shared_memory.threshold
+            if not shared and len(body) < self.batch_size and self.__queue(self.__join(header, body, False)):
+                return
         asyncio.create_task(self.send_message(data))
 
     async def __verify_client(self):
         payload = MessagePayload(
             type=Payloads.verification,
             id=self.local_name,
-            uuid=str(uuid.uuid4())
+            uuid=str(uuid.uuid4()),
+            data={
+                "codec": self.codec,
+                "compression": self.compression,
+                "compression_threshold": self.compression_threshold,
+                "group": self.group,
+                "member": self.member,
+                "shards": self.shards,
+                "resume": self.__resume_token,
+                "chunks": True,
+                **self.__advertisement()
+            }
         )
         await self.send_message(payload)
         logger.info("Verification request sent")
@@ -113,26 +377,47 @@ class Client:
     async def __connect(self) -> None:
         if self.websocket is None or self.websocket.closed:
             logger.info("Connecting to Websocket")
-            self.websocket = await websockets.connect(
-                self.uri,
+            # The permessage-deflate extension of websockets is disabled, it would compress every message
+            options = dict(
+                compression=None,
                 close_timeout=0,
                 ping_interval=None,
                 max_size=int(self.max_data_size * 1048576)
             )
+            if self.socket_path is not None:
+                self.websocket = await websockets.unix_connect(self.socket_path, "ws://localhost", **options)
+            else:
+                self.websocket = await websockets.connect(self.uri, **options)
             self._authorized = False
+            self.__wire_codec = binary.JSON
+            self.__wire_compression = None
+            self.__wire_batching = False
+            self.__wire_chunks = False
+            # The invalidations sent while the client was disconnected are lost
+            self.cache.clear()
+            # The frames batched for the previous connection are lost with it
+            if self.__batch_timer is not None:
+                self.__batch_timer.cancel()
+            self.__batch, self.__batch_bytes, self.__batch_timer, self.__flush_pending = [], 0, None, False
             self.__events.dispatch_event('winerp_connect')
             logger.info("Connected to Websocket")
 
     async def __reconnect_client(self) -> bool:
+        attempt = 0
         while True:
             try:
                 await self.__connect()
                 await self.__verify_client()
                 return True
             except Exception as error:
-                logger.debug("Failed to reconnect. Retrying in %ss.", self.reconnect_threshold)
+                # Exponential backoff with full jitter, the first retry is immediate
+                delay = 0
+                if attempt > 0:
+                    delay = random.uniform(0, min(self.reconnect_threshold, self.reconnect_delay * 2 ** min(attempt - 1, 32)))
+                attempt += 1
+                logger.debug("Failed to reconnect. Retrying in %.2fs.", delay)
                 logger.error("While trying to reconnect there has been an error. %s", str(error))
-                await asyncio.sleep(self.reconnect_threshold)
+                await asyncio.sleep(delay)
 
     async def start(self) -> None:
         """|coro|
@@ -155,26 +440,44 @@ class Client:
         else:
             raise ConnectionError("Websocket is already connected!")
 
-    def route(self, name: str = None):
+    def route(self, name: str = None, coalesce: bool = False, idempotent: bool = False):
         """
         A decorator to register your route. The route name should be unique.
 
+        A route can also be an async generator, each item it yields is sent as its own response.
+        Such a route is consumed with :meth:`stream`, a regular request receives the list of all the items.
+
+        If ``coalesce`` is True, the server forwards a single request out of the identical requests
+        sent to the route by different clients while it runs, and sends its response to all of them.
+        This should only be set for the routes whose response only depends on their keyword arguments.
+        The coalescible routes are sent to the server when the client connects.
+
+        If ``idempotent`` is True, the requests to the route which were not answered when this client disconnected
+        are sent again to the client taking its place, the on hold client promoted or another replica of its group,
+        see :mod:`winerp.lib.failover`. The requests to the other routes fail at once.
+        This should only be set for the routes which can safely run twice. The coalescible routes are idempotent.
+
         Raises
         -------
             ValueError
                 Route name already exists.
             InvalidRouteType
-                The function passed is not a coro.
+                The function passed is neither a coro nor an async generator.
         """
 
         def route_decorator(_route_func):
             if (name is None and _route_func.__name__ in self.__routes) or (name is not None and name in self.__routes):
                 raise ValueError("Route name is already registered!")
 
-            if not asyncio.iscoroutinefunction(_route_func):
-                raise InvalidRouteType("Route function must be a coro.")
+            if not asyncio.iscoroutinefunction(_route_func) and not inspect.isasyncgenfunction(_route_func):
+                raise InvalidRouteType("Route function must be a coro or an async generator.")
 
             self.__routes[name or _route_func.__name__] = _route_func
+            if coalesce:
+                self.__coalescible.add(name or _route_func.__name__)
+            if idempotent:
+                self.__idempotent.add(name or _route_func.__name__)
+            self.__advertise()
             return _route_func
 
         if isinstance(name, FunctionType):
@@ -184,7 +487,13 @@ class Client:
         else:
             return route_decorator
 
-    async def add_route(self, callback: typing.Callable, name: str = None):
+    async def add_route(
+            self,
+            callback: typing.Callable,
+            name: str = None,
+            coalesce: bool = False,
+            idempotent: bool = False
+    ):
         """|coro|
         A function to register a route. Either a decorator or this function can be used
         to register a route.
@@ -193,6 +502,11 @@ class Client:
         ----------
         callback
         name
+        coalesce
+            Whether the identical requests to the route are coalesced by the server, see :meth:`route`.
+        idempotent
+            Whether the requests to the route are sent again to another client if this one disconnects,
+            see :meth:`route`.
 
         Returns
         -------
@@ -203,15 +517,20 @@ class Client:
             KeyError
                 Route name already exists.
             InvalidRouteType
-                The function passed is not a coro.
+                The function passed is neither a coro nor an async generator.
 
         """
         if (name in self.__routes) or (callback.__name__ in self.__routes):
             raise KeyError(f"Route name is already registered!\nRoutes: {self.__routes}")
-        if not asyncio.iscoroutinefunction(callback):
-            raise InvalidRouteType('Route callback must be an asyncio coro.')
+        if not asyncio.iscoroutinefunction(callback) and not inspect.isasyncgenfunction(callback):
+            raise InvalidRouteType('Route callback must be an asyncio coro or an async generator.')
 
         self.__routes[name or callback.__name__] = callback
+        if coalesce:
+            self.__coalescible.add(name or callback.__name__)
+        if idempotent:
+            self.__idempotent.add(name or callback.__name__)
+        self.__advertise()
         return callback
 
     def remove_route(self, name: str):
@@ -234,9 +553,28 @@ class Client:
         """
         if name in self.__routes:
             del self.__routes[name]
+            self.__coalescible.discard(name)
+            self.__idempotent.discard(name)
+            self.__advertise()
         else:
             raise KeyError(f"Route name {name} does not exist!")
 
+    def __advertise(self):
+        # The routes are sent with the verification, then whenever they change
+        if self._authorized and self.websocket is not None and self.websocket.open:
+            self.__send_message(MessagePayload(
+                type=Payloads.advertisement,
+                id=self.local_name,
+                data=self.__advertisement()
+            ))
+
+    def __advertisement(self):
+        return {
+            "routes": sorted(self.__routes),
+            "coalesce": sorted(self.__coalescible),
+            "idempotent": sorted(self.__idempotent)
+        }
+
     async def __purge_sub_routes(self, timeout, _uuid):
         await asyncio.sleep(timeout)
         del self.__sub_routes[_uuid]
@@ -320,8 +658,11 @@ class Client:
     async def request(
             self,
             route: str,
-            source: str,
+            source: str = None,
             timeout: int = 60,
+            cache_ttl: float = None,
+            coalesce: bool = None,
+            routing_key: Any = None,
             **kwargs
     ) -> Any:
         """|coro|
@@ -329,14 +670,32 @@ class Client:
         Requests the server for a response.
         Resolves when the response is received matching the UUID.
 
+        If ``cache_ttl`` is set, the response is cached for ``cache_ttl`` seconds in :attr:`cache`
+        under the route, the source and the keyword arguments, and the same request is answered from the cache
+        until the source invalidates it with :meth:`invalidate`. The cached data is shared by the requests,
+        so it should not be modified.
+
+        If ``coalesce`` is True, a request identical to a request still waiting for its response is not sent,
+        it resolves with the same response or raises the same error. The response is shared the same way.
+
         Parameters
         -----------
         route: :class:`str`
             The route to request to.
-        source: :class:`str`
-            The destination
+        source: Optional[:class:`str`]
+            The destination. Defaults to None, the server sends the request to a client providing the route.
         timeout: :class:`int`
             Time to wait before raising :class:`~asyncio.TimeoutError`.
+        cache_ttl: Optional[:class:`float`]
+            The time in seconds for which the response is cached. Defaults to None, the response is not cached.
+        coalesce: Optional[:class:`bool`]
+            Whether identical concurrent requests are coalesced.
+            Defaults to None, they are if the route is in :attr:`coalesce_routes`.
+        routing_key: Optional[Any]
+            If the source is a worker group, the request is sent to the replica owning this key,
+            see :mod:`winerp.lib.groups`. The requests with the same key reach the same replica
+            while it is connected. Defaults to None, the request is sent to any replica.
+            The key is ignored if the source is a single client.
 
         Raises
         -------
@@ -345,7 +704,9 @@ class Client:
             UnauthorizedError
                 The client isn't authorized by the server.
             ValueError:
-                Missing either route or source or both.
+                Missing route.
+            ClientRuntimeError
+                The route raised an error, or no client provides it when ``source`` is left out.
             RuntimeError
                 If the UUID is not found.
             asyncio.TimeoutError
@@ -362,27 +723,312 @@ class Client:
             if not self._authorized:
                 raise UnauthorizedError("Client is not authorized!")
 
+            if not route:
+                raise ValueError("Missing required information for this request")
+
+            cache_key = None
+            if cache_ttl is not None:
+                cache_key = self.cache.key(source, route, kwargs, routing_key)
+            if cache_key is not None:
+                hit, data = self.cache.get(cache_key)
+                if hit:
+                    return data
+                version = self.cache.version
+
+            if coalesce is None:
+                coalesce = route in self.coalesce_routes
+            flight_key = None
+            if coalesce:
+                flight_key = cache_key or self.cache.key(source, route, kwargs, routing_key)
+            if flight_key is None:
+                recv = await self.__request(route, source, timeout, kwargs, routing_key)
+            else:
+                flight = self.__in_flight.get(flight_key)
+                if flight is None:
+                    flight = asyncio.ensure_future(self.__request(route, source, timeout, kwargs, routing_key))
+                    self.__in_flight[flight_key] = flight
+                    flight.add_done_callback(functools.partial(self.__land, flight_key))
+                else:
+                    logger.debug("Coalescing request @ route: %s", route)
+                # A waiter which is cancelled does not cancel the request of the others
+                recv = await asyncio.shield(flight)
+            # Objects are not cached, their functions expire
+            if cache_key is not None and not isinstance(recv, responseObject):
+                self.cache.put(cache_key, recv, cache_ttl, version)
+            return recv
+
+        else:
+            raise ClientNotReadyError("The client has not been started or has disconnected")
+
+    async def __request(self, route, source, timeout, kwargs, routing_key=None):
+        logger.info("Requesting IPC Server for %r", route)
+
+        _uuid = str(uuid.uuid4())
+        payload = MessagePayload(
+            type=Payloads.request,
+            id=self.local_name,
+            destination=source,
+            route=route,
+            data=kwargs,
+            uuid=_uuid
+        )
+        if routing_key is not None:
+            payload.key = routing_key
+
+        # The listener is registered first, a chunked request may be answered before it is fully sent
+        response = self.__get_response(_uuid, asyncio.get_event_loop(), timeout=timeout)
+        try:
+            await self.send_message(payload)
+        except Exception:
+            response.close()
+            del self.listeners[_uuid]
+            raise
+        return await response
+
+    def __land(self, key, flight):
+        if self.__in_flight.get(key) is flight:
+            del self.__in_flight[key]
+        # The error is retrieved by the waiters, if any are left
+        if not flight.cancelled():
+            flight.exception()
+
+    async def invalidate(self, route: str = None, **kwargs):
+        """|coro|
+
+        Invalidates the responses of this client cached by the other clients, see the ``cache_ttl`` of :meth:`request`.
+
+        Parameters
+        -----------
+        route: Optional[:class:`str`]
+            The route of the invalidated responses. Defaults to None, every response of this client is invalidated.
+        \*\*kwargs
+            The keyword arguments of the invalidated response.
+            If none are passed, every response of the route is invalidated.
+
+        Raises
+        -------
+            ClientNotReadyError
+                The client is currently not ready to send or accept requests.
+            UnauthorizedError
+                The client isn't authorized by the server.
+        """
+        if self.websocket is None or not self.websocket.open:
+            raise ClientNotReadyError("The client has not been started or has disconnected")
+        if self._on_hold:
+            raise ClientNotReadyError("The client is currently not ready to send or accept requests.")
+        if not self._authorized:
+            raise UnauthorizedError("Client is not authorized!")
+
+        logger.info("Invalidating the cached responses @ route: %s", route)
+        payload = MessagePayload(
+            type=Payloads.invalidation,
+            id=self.local_name,
+            route=route,
+            data=kwargs if route is not None and kwargs else None
+        )
+        await self.send_message(payload)
+
+    async def request_many(
+            self,
+            requests: List[Tuple[str, str, dict]],
+            timeout: int = 60
+    ) -> List[Any]:
+        """|coro|
+
+        Sends many requests at once and resolves when all of them are answered::
+
+            guild, member = await client.request_many([
+                ("get_guild", "bot-2", {"guild_id": 123}),
+                ("get_member", "bot-2", {"guild_id": 123, "member_id": 456}),
+            ])
+
+        The requests to the same destination are sent in a single frame, the destination runs them
+        concurrently and sends all their results back in a single frame.
+
+        Parameters
+        -----------
+        requests: List[Tuple[:class:`str`, :class:`str`, :class:`dict`]]
+            The route, the destination and the keyword arguments of each request.
+        timeout: :class:`int`
+            Time to wait for the results of a destination.
+
+        Raises
+        -------
+            ClientNotReadyError
+                The client is currently not ready to send or accept requests.
+            UnauthorizedError
+                The client isn't authorized by the server.
+            ValueError:
+                Missing either route or source or both.
+
+        Returns
+        --------
+            List[:class:`Any`]
+                The data of each request, in the order of ``requests``. A request which failed or timed out
+                holds the :class:`~winerp.lib.errors.ClientRuntimeError` or
+                :class:`~asyncio.TimeoutError` instead, it is not raised.
+        """
+        if self.websocket is None or not self.websocket.open:
+            raise ClientNotReadyError("The client has not been started or has disconnected")
+        if self._on_hold:
+            raise ClientNotReadyError("The client is currently not ready to send or accept requests.")
+        if not self._authorized:
+            raise UnauthorizedError("Client is not authorized!")
+
+        # destination -> indexes of its requests
+        batches = {}
+        for index, (route, source, _) in enumerate(requests):
             if not route or not source:
                 raise ValueError("Missing required information for this request")
+            batches.setdefault(source, []).append(index)
 
-            logger.info("Requesting IPC Server for %r", route)
+        results = [None] * len(requests)
 
+        async def send_batch(source, indexes):
             _uuid = str(uuid.uuid4())
             payload = MessagePayload(
                 type=Payloads.request,
                 id=self.local_name,
                 destination=source,
-                route=route,
-                data=kwargs,
-                uuid=_uuid
+                uuid=_uuid,
+                data=None
             )
+            payload.batch = [{"route": requests[index][0], "data": requests[index][2] or {}} for index in indexes]
+            response = self.__get_response(_uuid, asyncio.get_event_loop(), timeout=timeout)
+            try:
+                await self.send_message(payload)
+            except Exception:
+                response.close()
+                del self.listeners[_uuid]
+                raise
+            try:
+                items = [self.__batch_result(source, item) for item in await response]
+            except (ClientRuntimeError, asyncio.TimeoutError) as error:
+                # The whole batch failed, e.g. the destination is not connected
+                items = [error] * len(indexes)
+            for index, item in zip(indexes, items):
+                results[index] = item
+
+        logger.info("Requesting IPC Server for %d routes of %d clients", len(requests), len(batches))
+        await asyncio.gather(*(send_batch(source, indexes) for source, indexes in batches.items()))
+        return results
+
+    def __batch_result(self, source, item):
+        if "error" in item:
+            return ClientRuntimeError(item["error"])
+        if item.get("pseudo_object"):
+            return responseObject(self, source, item["data"])
+        return item["data"]
+
+    async def stream(
+            self,
+            route: str,
+            source: str,
+            timeout: int = 60,
+            window: int = 16,
+            **kwargs
+    ) -> typing.AsyncIterator[Any]:
+        """
+        Requests an async generator route and yields the items as they are received::
 
-            await self.send_message(payload)
-            recv = await self.__get_response(_uuid, asyncio.get_event_loop(), timeout=timeout)
-            return recv
+            async for member in client.stream("members", source="bot-2", guild_id=123):
+                ...
 
-        else:
+        The route sends at most ``window`` items ahead of the consumer, so a slow consumer pauses the route.
+        The route is stopped if the consumer leaves the loop early.
+        A route which is not an async generator streams its single response.
+
+        Parameters
+        -----------
+        route: :class:`str`
+            The route to request to.
+        source: :class:`str`
+            The destination
+        timeout: :class:`int`
+            Time to wait for each item before raising :class:`~asyncio.TimeoutError`.
+            The route is stopped if the consumer does not take an item within this time while the window is full.
+        window: :class:`int`
+            The number of items the route can send ahead of the consumer. Defaults to 16.
+
+        Raises
+        -------
+            ClientNotReadyError
+                The client is currently not ready to send or accept requests.
+            UnauthorizedError
+                The client isn't authorized by the server.
+            ValueError:
+                Missing either route or source or both.
+            ClientRuntimeError
+                The route raised an error.
+            asyncio.TimeoutError
+                If an item is not received within the timeout.
+        """
+        if self.websocket is None or not self.websocket.open:
             raise ClientNotReadyError("The client has not been started or has disconnected")
+        if self._on_hold:
+            raise ClientNotReadyError("The client is currently not ready to send or accept requests.")
+        if not self._authorized:
+            raise UnauthorizedError("Client is not authorized!")
+        if not route or not source:
+            raise ValueError("Missing required information for this request")
+
+        logger.info("Requesting IPC Server for stream %r", route)
+        _uuid = str(uuid.uuid4())
+        payload = MessagePayload(
+            type=Payloads.request,
+            id=self.local_name,
+            destination=source,
+            route=route,
+            data=kwargs,
+            uuid=_uuid
+        )
+        payload.stream = {"window": window, "timeout": timeout}
+        queue = self.__streams[_uuid] = asyncio.Queue()
+        # The credits are granted back by halves of the window
+        threshold = max(window // 2, 1)
+        consumed = 0
+        ended = False
+        try:
+            await self.send_message(payload)
+            while True:
+                message = await asyncio.wait_for(queue.get(), timeout)
+                if message.type.error:
+                    ended = True
+                    raise ClientRuntimeError(message.data)
+                state = message.stream
+                if state is None:
+                    ended = True
+                    yield message.data
+                    return
+                if state.get("end"):
+                    ended = True
+                    return
+
+                yield message.data
+                consumed += 1
+                if consumed >= threshold:
+                    await self.send_message(self.__stream_control(source, _uuid, {"credits": consumed}))
+                    consumed = 0
+        finally:
+            del self.__streams[_uuid]
+            if not ended:
+                self.__closed_streams.add(_uuid)
+                asyncio.get_running_loop().call_later(
+                    timeout if timeout is not None else 60, self.__closed_streams.discard, _uuid
+                )
+                if self.websocket.open:
+                    self.__send_message(self.__stream_control(source, _uuid, {"cancel": True}))
+
+    def __stream_control(self, destination, _uuid, state):
+        payload = MessagePayload(
+            type=Payloads.stream,
+            id=self.local_name,
+            destination=destination,
+            uuid=_uuid,
+            data=None
+        )
+        payload.stream = state
+        return payload
 
     async def inform(
             self,
@@ -435,6 +1081,99 @@ class Client:
         else:
             raise ClientNotReadyError("The client has not been started or has disconnected")
 
+    async def subscribe(self, *patterns: str):
+        """|coro|
+
+        Subscribes to topics. The data published to them dispatches the ``on_winerp_publication`` event::
+
+            await client.subscribe("guild.*.member_join")
+
+            @client.event
+            async def on_winerp_publication(data, topic, source):
+                ...
+
+        A topic is a list of segments separated by dots. In a pattern, ``*`` matches a single segment
+        and a trailing ``#`` matches any number of segments. The subscriptions are kept by the client
+        and sent again to the server when it reconnects, so this can be called before the client is ready.
+
+        Parameters
+        -----------
+        \*patterns: :class:`str`
+            The topics or topic patterns to subscribe to.
+
+        Raises
+        -------
+            ValueError
+                A pattern is not valid.
+        """
+        for pattern in patterns:
+            topics.validate(pattern)
+        self.__topics.update(patterns)
+        if self._authorized and self.websocket is not None and self.websocket.open:
+            self.__subscribed.update(patterns)
+            await self.send_message(self.__subscription(subscribe=list(patterns)))
+
+    async def unsubscribe(self, *patterns: str):
+        """|coro|
+
+        Unsubscribes from topics, see :meth:`subscribe`.
+
+        Parameters
+        -----------
+        \*patterns: :class:`str`
+            The topics or topic patterns passed to :meth:`subscribe`.
+        """
+        self.__topics.difference_update(patterns)
+        if self._authorized and self.websocket is not None and self.websocket.open:
+            self.__subscribed.difference_update(patterns)
+            await self.send_message(self.__subscription(unsubscribe=list(patterns)))
+
+    def __subscription(self, subscribe=(), unsubscribe=()):
+        return MessagePayload(
+            type=Payloads.subscription,
+            id=self.local_name,
+            data={"subscribe": list(subscribe), "unsubscribe": list(unsubscribe)}
+        )
+
+    async def publish(self, topic: str, data: Any):
+        """|coro|
+
+        Publishes data to a topic. The data is only sent to the clients subscribed to the topic,
+        there is no tracking of the data so there won't be any error if no client receives it.
+
+        Parameters
+        -----------
+        topic: :class:`str`
+            The topic, without wildcards.
+        data: :class:`Any`
+            The data to publish.
+
+        Raises
+        -------
+            ClientNotReadyError
+                The client is currently not ready to send or accept requests.
+            UnauthorizedError
+                The client isn't authorized by the server.
+            ValueError
+                The topic is not valid.
+        """
+        if self.websocket is None or not self.websocket.open:
+            raise ClientNotReadyError("The client has not been started or has disconnected")
+        if self._on_hold:
+            raise ClientNotReadyError("The client is currently not ready to send or accept requests.")
+        if not self._authorized:
+            raise UnauthorizedError("Client is not authorized!")
+        topics.validate(topic, wildcards=False)
+
+        logger.info("Publishing to topic %s", topic)
+        payload = MessagePayload(
+            type=Payloads.publication,
+            id=self.local_name,
+            route=topic,
+            data=data
+        )
+        await self.send_message(payload)
+
     async def wait_until_ready(self):
         """|coro|
 
@@ -498,14 +1237,40 @@ class Client:
     async def __on_message(self):
         logger.info("Listening to messages")
         message = None
+        resumed = False
         while True:
             try:
-                message = WsMessage(orjson.loads(await self.websocket.recv()))
-            except websockets.exceptions.ConnectionClosedError:
+                frame = await self.websocket.recv()
+                message = self.__decode(frame)
+                if message["type"] == Payloads.success:
+                    self.__resume_token = message.get("resume")
+                    resumed = message.get("resumed", False)
+                    self.__wire_codec = message.get("codec", binary.JSON)
+                    self.__wire_compression = message.get("compression")
+                    self.__wire_batching = self.batch_window is not None and message.get("batching", False)
+                    self.__wire_chunks = message.get("chunks", False)
+                if shm.HANDLE_KEY in message:
+                    message = self.__load_shared_memory(message)
+                    if message is None:
+                        continue
+                if chunks.CHUNK_KEY in message:
+                    message = self.__reassemble(message)
+                    if message is None:
+                        continue
+                message = WsMessage(message)
+            except websockets.exceptions.ConnectionClosed as error:
                 self.__events.dispatch_event('winerp_disconnect')
+                # A connection closed by this client, or replaced by a newer connection of this client, is not opened again
+                received = getattr(error, "rcvd", None)
+                if error.sent is not None and not error.rcvd_then_sent:
+                    break
+                if received is not None and received.code == sessions.REPLACED:
+                    break
                 if self.reconnect:
                     if not await self.__reconnect_client():
                         break
+                    # The last message was already handled, the next one comes from the new connection
+                    continue
                 else:
                     break
 
@@ -514,31 +1279,42 @@ class Client:
                 self.__events.dispatch_event('winerp_ready')
                 self._authorized = True
                 self._on_hold = False
+                # A resumed session kept the subscriptions, only the changes made while disconnected are sent
+                if not resumed:
+                    self.__subscribed = set()
+                subscribe, unsubscribe = self.__topics - self.__subscribed, self.__subscribed - self.__topics
+                if subscribe or unsubscribe:
+                    self.__send_message(self.__subscription(subscribe=sorted(subscribe), unsubscribe=sorted(unsubscribe)))
+                self.__subscribed = set(self.__topics)
 
             elif message.type.ping:
                 logger.debug("Received a ping from server")
                 asyncio.create_task(self._dispatch(message))
 
             elif message.type.request:
-                if message.route not in self.__routes:
+                if message.batch is not None:
+                    logger.info("Fulfilling a batch of %d requests", len(message.batch))
+                    asyncio.create_task(self._fulfill_batch(message))
+                    self.__events.dispatch_event('winerp_request')
+                elif message.route not in self.__routes:
                     logger.info("Failed to fulfill request, route not found")
                     payload = MessagePayload(
                         type=Payloads.error,
                         id=self.local_name,
                         data="Route not found",
                         traceback="Route not found",
-                        destination=message.id,
+                        destination=message.destination,
                         uuid=message.uuid
                     )
                     self.__send_message(payload)
-                    return
-                logger.info("Fulfilling request @ route: %s", message.route)
-                asyncio.create_task(self._fulfill_request(message))
-                self.__events.dispatch_event('winerp_request')
+                else:
+                    logger.info("Fulfilling request @ route: %s", message.route)
+                    asyncio.create_task(self._fulfill_request(message))
+                    self.__events.dispatch_event('winerp_request')
 
             elif message.type.response:
                 logger.info("Received a response from server @ uuid: %s", message.uuid)
-                asyncio.create_task(self._dispatch(message))
+                self.__dispatch_response(message)
                 self.__events.dispatch_event('winerp_response')
 
             elif message.type.error:
@@ -550,8 +1326,28 @@ class Client:
                     logger.debug("Failed to fulfill request: %s", message.data)
                     self.__events.dispatch_event('winerp_error', message.data)
 
-                if message.uuid is not None:
-                    asyncio.create_task(self._dispatch(message))
+                # The requester of a stream this client produces is no longer connected
+                credits = self.__credits.get(message.uuid)
+                if credits is not None:
+                    credits.cancel()
+                elif message.uuid in self.listeners or message.uuid in self.__streams:
+                    self.__dispatch_response(message)
+
+            elif message.type.stream:
+                credits = self.__credits.get(message.uuid)
+                if credits is not None:
+                    if message.stream.get("cancel"):
+                        credits.cancel()
+                    else:
+                        credits.grant(message.stream.get("credits", 0))
+
+            elif message.type.invalidation:
+                logger.debug("Invalidating the cached responses of client %s @ route: %s", message.id, message.route)
+                self.cache.invalidate(message.id, message.route, message.data)
+
+            elif message.type.publication:
+                logger.debug("Received a publication to topic %s from client: %s", message.route, message.id)
+                self.__events.dispatch_event('winerp_publication', message.data, message.route, message.id)
 
             elif message.type.information:
                 if message.data:
@@ -588,6 +1384,47 @@ class Client:
                     )
                     self.__send_message(payload)
 
+    def __load_shared_memory(self, message):
+        handle = message.pop(shm.HANDLE_KEY)
+        try:
+            message.update(shm.load(handle))
+            return message
+        except FileNotFoundError:
+            error = "Shared memory segment %s is no longer available" % handle["name"]
+            logger.error(error)
+        return self.__undeliverable(message, error)
+
+    def __reassemble(self, message):
+        try:
+            return self.__reassembler.add(message)
+        except ValueError as error:
+            logger.error("%s. Message type: %s, uuid: %s", str(error), message["type"], message.get("uuid"))
+            return self.__undeliverable(message, str(error))
+
+    def __on_chunks_expired(self, message):
+        error = "Chunked message was not received in time"
+        logger.error("%s. Message type: %s, uuid: %s", error, message["type"], message.get("uuid"))
+        message = self.__undeliverable(message, error)
+        if message is not None and message.get("uuid") in self.listeners:
+            asyncio.create_task(self._dispatch(WsMessage(message)))
+
+    def __undeliverable(self, message, error):
+        # A requester is sent back the error, other messages are turned into the error
+        if message["type"] == Payloads.request:
+            self.__send_message(MessagePayload(
+                type=Payloads.error,
+                id=self.local_name,
+                data=error,
+                traceback=error,
+                destination=message["destination"],
+                uuid=message["uuid"]
+            ))
+            return None
+
+        message["type"] = Payloads.error
+        message["data"] = error
+        return message
+
     def __parse_object(self, payload):
         payload.pseudo_object = True
         dummy_object = payload.data
@@ -615,16 +1452,31 @@ class Client:
                 )
             )
 
+    def __dispatch_response(self, message):
+        # The responses of a stream are queued in order, the others resolve their listener
+        queue = self.__streams.get(message.uuid)
+        if queue is not None:
+            queue.put_nowait(message)
+        elif message.uuid not in self.__closed_streams:
+            asyncio.create_task(self._dispatch(message))
+
     async def _fulfill_request(self, message: WsMessage):
         route = message.route
         func = self.__routes[route]
         data = message.data
+        if inspect.isasyncgenfunction(func) and message.stream is not None:
+            await self._fulfill_stream(message, func)
+            return
+
         payload = MessagePayload().from_message(message)
         payload.type = Payloads.response
         payload.id = self.local_name
 
         try:
-            payload.data = await func(message.destination, **data)
+            if inspect.isasyncgenfunction(func):
+                payload.data = [item async for item in func(message.destination, **data)]
+            else:
+                payload.data = await func(message.destination, **data)
             if isinstance(payload.data, winerpObject):
                 self.__parse_object(payload)
         except Exception as error:
@@ -655,6 +1507,80 @@ class Client:
                 )
                 self.__send_message(payload)
 
+    async def _fulfill_batch(self, message: WsMessage):
+        payload = MessagePayload().from_message(message)
+        payload.type = Payloads.response
+        payload.id = self.local_name
+        payload.data = await asyncio.gather(
+            *(self.__fulfill_batch_item(message.destination, item) for item in message.batch)
+        )
+        try:
+            await self.send_message(payload)
+        except TypeError as error:
+            logger.exception("Failed to convert data to json")
+            self.__events.dispatch_event('winerp_error', error)
+            payload.type = Payloads.error
+            payload.data = str(error)
+            payload.traceback = ''.join(traceback.format_exception(TypeError, error, error.__traceback__))
+            self.__send_message(payload)
+
+    async def __fulfill_batch_item(self, source, item):
+        func = self.__routes.get(item["route"])
+        if func is None:
+            return {"error": "Route not found"}
+        try:
+            if inspect.isasyncgenfunction(func):
+                data = [value async for value in func(source, **item["data"])]
+            else:
+                data = await func(source, **item["data"])
+            if isinstance(data, winerpObject):
+                serialized = data.serialize()
+                self.__register_object_funcs(data)
+                return {"data": serialized, "pseudo_object": True}
+            return {"data": data}
+        except Exception as error:
+            logger.exception(error)
+            self.__events.dispatch_event('winerp_error', error)
+            return {"error": str(error)}
+
+    async def _fulfill_stream(self, message: WsMessage, func):
+        credits = self.__credits[message.uuid] = streams.Credits(message.stream.get("window", 16))
+        items = func(message.destination, **message.data)
+        seq = 0
+        try:
+            # A credit is taken before the next item is produced, so a paused stream does no work
+            while await credits.acquire(message.stream.get("timeout")):
+                try:
+                    item = await items.__anext__()
+                except StopAsyncIteration:
+                    await self.send_message(self.__stream_item(message, None, {"seq": seq, "end": True}))
+                    break
+                await self.send_message(self.__stream_item(message, item, {"seq": seq}))
+                seq += 1
+        except Exception as error:
+            logger.exception(error)
+            self.__events.dispatch_event('winerp_error', error)
+            payload = self.__stream_item(message, str(error), None)
+            payload.type = Payloads.error
+            payload.traceback = ''.join(traceback.format_exception(type(error), error, error.__traceback__))
+            await self.send_message(payload)
+        finally:
+            del self.__credits[message.uuid]
+            await items.aclose()
+
+    def __stream_item(self, message, item, state):
+        payload = MessagePayload(
+            type=Payloads.response,
+            id=self.local_name,
+            destination=message.destination,
+            route=message.route,
+            uuid=message.uuid,
+            data=item
+        )
+        if state is not None:
+            payload.stream = state
+        return payload
+
     async def _dispatch(self, msg: WsMessage):
         data = msg.data
         _uuid = msg.uuid
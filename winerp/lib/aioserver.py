@@ -0,0 +1,209 @@
+import asyncio
+import errno
+import logging
+import os
+import socket
+import stat
+
+import websockets
+
+from .outbox import Outbox
+
+logger = logging.getLogger(__name__)
+
+
+def _noop(*args, **kwargs):
+    pass
+
+
+def _remove_stale_socket(path: str):
+    # A socket file left behind by a previous run would make the bind fail,
+    # it is only removed if no server accepts connections on it anymore
+    if not os.path.exists(path) or not stat.S_ISSOCK(os.stat(path).st_mode):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(path)
+        except ConnectionRefusedError:
+            os.unlink(path)
+            return
+    raise OSError(errno.EADDRINUSE, "Another server is listening on %s" % path)
+
+
+class AsyncWebsocketServer:
+    """
+    An asyncio based websocket server exposing the same callback interface as
+    ``websocket_server.WebsocketServer``.
+    Every connection is served from a single event loop, so the callbacks are never
+    called concurrently and no thread is spawned per connected client.
+
+    A client is represented by a ``dict`` like ``{'id': id, 'handler': websocket, 'address': (addr, port), 'outbox': outbox}``.
+    Messages are queued to the :class:`~winerp.lib.outbox.Outbox` of the client and sent by its own writer task,
+    so a slow client only blocks its own writer.
+
+    Parameters
+    -----------
+    host: Optional[:class:`str`]
+        The host to bind to. Defaults to 127.0.0.1.
+    port: Optional[:class:`int`]
+        The port to bind to. Defaults to 0.
+    use_uvloop: Optional[:class:`bool`]
+        If set to True, the event loop is provided by ``uvloop``. Defaults to False.
+    reuse_port: Optional[:class:`bool`]
+        If set to True, the socket is bound with ``SO_REUSEPORT`` so several processes
+        can listen on the same port. Defaults to False.
+    unix_path: Optional[:class:`str`]
+        The path of a unix socket to listen on as well. Defaults to None.
+        A socket file left by a previous run is replaced, :meth:`serve_forever` raises :class:`OSError`
+        if another server listens on it.
+    queue_size: Optional[:class:`int`]
+        The size of the outbox of each client. Defaults to 1024.
+    """
+
+    def __init__(
+            self,
+            host: str = "127.0.0.1",
+            port: int = 0,
+            use_uvloop: bool = False,
+            reuse_port: bool = False,
+            unix_path: str = None,
+            queue_size: int = 1024
+    ):
+        self.host = host
+        self.port = port
+        self.use_uvloop = use_uvloop
+        self.reuse_port = reuse_port
+        self.unix_path = unix_path
+        self.queue_size = queue_size
+        self.clients = {}
+        self.id_counter = 0
+        self.loop = None
+        self.new_client = _noop
+        self.client_left = _noop
+        self.message_received = _noop
+        self.startup = None
+        # Whether the connections are accepted
+        self.listening = False
+        self.__serving = None
+
+    def set_fn_startup(self, fn):
+        """
+        Sets a coroutine function awaited in the event loop before accepting connections.
+        """
+        self.startup = fn
+
+    def set_fn_new_client(self, fn):
+        self.new_client = fn
+
+    def set_fn_client_left(self, fn):
+        self.client_left = fn
+
+    def set_fn_message_received(self, fn):
+        self.message_received = fn
+
+    def stop(self):
+        """
+        Stops serving, the clients are disconnected. Can be called from any thread.
+        """
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.__stop)
+
+    def __stop(self):
+        if self.__serving is not None and not self.__serving.done():
+            self.__serving.set_result(None)
+
+    def send_message(self, client, msg):
+        """
+        Queues ``msg`` to be sent to ``client``. Must be called from the event loop.
+        """
+        client["outbox"].push(msg)
+
+    def disconnect(self, client, code: int = 1000, reason: str = ""):
+        """
+        Closes the connection of ``client`` with the close ``code`` and ``reason``. Must be called from the event loop.
+        """
+        self.loop.create_task(client["handler"].close(code, reason))
+
+    async def __writer(self, websocket, outbox, event):
+        try:
+            while True:
+                await event.wait()
+                event.clear()
+                while outbox.frames:
+                    await websocket.send(outbox.pop())
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    async def __handler(self, websocket):
+        self.id_counter += 1
+        event = asyncio.Event()
+        client = {
+            'id': self.id_counter,
+            'handler': websocket,
+            'address': websocket.remote_address,
+            'outbox': Outbox(self.queue_size, event.set)
+        }
+        writer = self.loop.create_task(self.__writer(websocket, client['outbox'], event))
+        self.clients[client['id']] = client
+        self.new_client(client, self)
+        try:
+            async for message in websocket:
+                self.message_received(client, self, message)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            writer.cancel()
+            del self.clients[client['id']]
+            self.client_left(client, self)
+
+    async def serve_forever(self):
+        """|coro|
+
+        Serves connections until cancelled or :meth:`stop` is called.
+        """
+        self.loop = asyncio.get_running_loop()
+        self.__serving = self.loop.create_future()
+        if self.startup is not None:
+            await self.startup()
+        async with websockets.serve(
+            self.__handler,
+            self.host,
+            self.port,
+            max_size=None,
+            ping_interval=None,
+            reuse_port=self.reuse_port or None
+        ):
+            logger.info("Listening on port %d for clients.." % self.port)
+            if self.unix_path is None:
+                self.listening = True
+                await self.__serving
+                self.listening = False
+                return
+
+            _remove_stale_socket(self.unix_path)
+            async with websockets.unix_serve(
+                self.__handler,
+                self.unix_path,
+                max_size=None,
+                ping_interval=None
+            ):
+                logger.info("Listening on %s for clients.." % self.unix_path)
+                self.listening = True
+                await self.__serving
+                self.listening = False
+
+    def run_forever(self):
+        """
+        Runs the event loop and serves connections until interrupted.
+        """
+        if self.use_uvloop:
+            try:
+                import uvloop
+            except ImportError:
+                raise RuntimeError("uvloop is not installed. Install it using `pip install uvloop`") from None
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+        try:
+            asyncio.run(self.serve_forever())
+        except KeyboardInterrupt:
+            logger.info("Server terminated.")
@@ -0,0 +1,126 @@
+"""
+The binary wire codec, negotiated by a client during its verification.
+
+A binary frame is the ``msgpack`` array of the header fields, in the order of
+:data:`~winerp.lib.envelope.HEADER_FIELDS`, followed by the ``msgpack`` map of the body::
+
+    [2, "a", "b", "...", "get_data"]
+    {0: {...}, 1: None, 2: None}
+
+The well known fields of the body are tagged with integers, see :data:`BODY_TAGS`, and ``bytes`` are sent as-is.
+JSON frames always start with ``{`` while binary frames start with an array, so both can be told apart
+from their first byte and the server can forward the frames of a client to clients using another codec.
+
+``bytes`` can't be represented in JSON, they are sent as base64 strings to the clients using JSON.
+"""
+import base64
+from typing import Any, Dict, Tuple, Union
+
+import orjson
+
+from .envelope import HEADER_FIELDS, partition
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = "json"
+MSGPACK = "msgpack"
+CODECS = (JSON, MSGPACK)
+
+BODY_TAGS = {"data": 0, "traceback": 1, "pseudo_object": 2}
+BODY_FIELDS = {tag: field for field, tag in BODY_TAGS.items()}
+
+
+class Packed:
+    """
+    The raw ``msgpack`` body of a binary frame, as returned by :func:`split`.
+    """
+
+    __slots__ = ("buffer",)
+
+    def __init__(self, buffer: Union[bytes, memoryview]):
+        self.buffer = buffer
+
+    def __len__(self) -> int:
+        return len(self.buffer)
+
+
+def is_binary(frame: Union[str, bytes, memoryview]) -> bool:
+    """
+    Returns True if ``frame`` was encoded by this codec.
+    """
+    return not isinstance(frame, str) and len(frame) > 0 and frame[0] != 0x7b  # '{'
+
+
+def json_default(value):
+    """
+    Encodes ``bytes`` to base64 strings, to be passed as the ``default`` of ``orjson.dumps``.
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(value).decode("ascii")
+    raise TypeError("Type is not JSON serializable: %s" % type(value).__name__)
+
+
+def pack_body(body: Dict[str, Any]) -> Packed:
+    """
+    Encodes a body ``dict``, tagging its well known fields.
+    """
+    return Packed(msgpack.packb({BODY_TAGS.get(key, key): value for key, value in body.items()}))
+
+
+def unpack_body(body: Packed) -> Dict[str, Any]:
+    """
+    Decodes a body encoded by :func:`pack_body`.
+    """
+    return {
+        BODY_FIELDS.get(key, key): value
+        for key, value in msgpack.unpackb(body.buffer, strict_map_key=False).items()
+    }
+
+
+def to_json(body: Packed) -> bytes:
+    """
+    Re-encodes a body to JSON, for the clients which do not use this codec.
+    The keys of the maps which are not strings, like integers, are turned to strings.
+    """
+    return orjson.dumps(unpack_body(body), default=json_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def encode(message: Dict[str, Any]) -> bytes:
+    """
+    Encodes a message ``dict`` to a binary frame.
+    """
+    header, body = partition(message)
+    return join(header, pack_body(body))
+
+
+def split(frame: Union[bytes, memoryview]) -> Tuple[Dict[str, Any], Packed]:
+    """
+    Splits a binary frame to its parsed header and its raw body, see :func:`winerp.lib.envelope.split`.
+    """
+    unpacker = msgpack.Unpacker()
+    unpacker.feed(frame)
+    header = dict(zip(HEADER_FIELDS, unpacker.unpack()))
+    return header, Packed(memoryview(frame)[unpacker.tell():])
+
+
+def join(header: Dict[str, Any], body: Packed) -> bytes:
+    """
+    Joins a header to a raw body returned by :func:`split`. The body is not re-encoded.
+    """
+    fields = [header.get(field) for field in HEADER_FIELDS]
+    # The trailing fields which are not set are left out, like the routing key of most messages
+    while fields and fields[-1] is None:
+        fields.pop()
+    return msgpack.packb(fields) + body.buffer
+
+
+def decode(frame: Union[bytes, memoryview]) -> Dict[str, Any]:
+    """
+    Decodes a binary frame to a message ``dict``.
+    """
+    header, body = split(frame)
+    header.update(unpack_body(body))
+    return header
@@ -0,0 +1,108 @@
+"""
+The cache of the responses received by a :class:`~winerp.client.Client`.
+
+A response is cached under the source, the route, the keyword arguments and the routing key of its request.
+The serving client invalidates the entries of a route with an
+:attr:`~winerp.lib.payload.Payloads.invalidation` message broadcast by the server::
+
+    {"data":{"guild_id":123}}
+    {"data":null}
+
+The data holds the keyword arguments of the invalidated entry, or is null to invalidate every entry of the route.
+"""
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
+
+Key = Tuple[str, str, bytes, Optional[str]]
+
+
+class ResponseCache:
+    """
+    A LRU cache of responses, each expiring after its own time to live.
+
+    Parameters
+    -----------
+    max_size: :class:`int`
+        The number of responses held. The least recently used response is evicted when there are more.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        # key -> (expiry time, data), from the least to the most recently used
+        self.__entries: "OrderedDict[Key, Tuple[float, Any]]" = OrderedDict()
+        # route -> count
+        self.hits: Dict[str, int] = defaultdict(int)
+        self.misses: Dict[str, int] = defaultdict(int)
+        self.evictions = 0
+        # Incremented by every invalidation, so a response requested before it is not cached
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    @staticmethod
+    def key(source: str, route: str, kwargs: Dict[str, Any], routing_key: Any = None) -> Optional[Key]:
+        """
+        Returns the key of a request, None if its keyword arguments can't be encoded to JSON.
+        """
+        try:
+            data = orjson.dumps(kwargs, option=orjson.OPT_SORT_KEYS)
+        except TypeError:
+            return None
+        return source, route, data, None if routing_key is None else str(routing_key)
+
+    def get(self, key: Key) -> Tuple[bool, Any]:
+        """
+        Returns whether the response of ``key`` is cached, and its data.
+        """
+        entry = self.__entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self.__entries.move_to_end(key)
+                self.hits[key[1]] += 1
+                return True, entry[1]
+            del self.__entries[key]
+        self.misses[key[1]] += 1
+        return False, None
+
+    def put(self, key: Key, data: Any, ttl: float, version: int):
+        """
+        Caches the data of a response for ``ttl`` seconds,
+        unless the cache was invalidated since ``version`` was read.
+        """
+        if version != self.version:
+            return
+        self.__entries[key] = (time.monotonic() + ttl, data)
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.max_size:
+            self.__entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, source: str, route: Optional[str] = None, kwargs: Optional[Dict[str, Any]] = None):
+        """
+        Drops the responses of a request if ``kwargs`` is set, whatever their routing key,
+        else every response of ``route``, or every response of ``source`` if ``route`` is None.
+        The responses to the requests sent without a source, whose provider is unknown, are dropped as well.
+        """
+        self.version += 1
+        data = None
+        if route is not None and kwargs is not None:
+            key = self.key(source, route, kwargs)
+            if key is None:
+                return
+            data = key[2]
+        for key in [
+            key for key in self.__entries
+            if key[0] in (source, None) and route in (None, key[1]) and data in (None, key[2])
+        ]:
+            del self.__entries[key]
+
+    def clear(self):
+        """
+        Drops every response.
+        """
+        self.version += 1
+        self.__entries.clear()
@@ -0,0 +1,242 @@
+"""
+Chunked transfer of the messages larger than the chunk size of a client.
+
+A client sends ``"chunks":true`` in the data of its verification to take part in chunked transfers,
+the server answers with ``"chunks":true`` in its :attr:`~winerp.lib.payload.Payloads.success` message.
+The body of a large message is encoded and compressed once, as it would be sent in a single frame,
+and split into pieces of ``chunk_size`` bytes, each sent in its own frame holding the header of the message
+and a body like::
+
+    {"chunk":{"id":"1a2b3c","seq":0,"count":3,"codec":"msgpack"},"data":"<piece>"}
+
+``codec`` is the codec the pieces were encoded with, JSON if it is left out.
+The server routes every chunk like any other message, so the chunks of a large message interleave with
+the other messages. A piece is sent as ``bytes`` with the ``msgpack`` codec and as a base64 string otherwise,
+like any other ``bytes``. The server joins the chunks sent to the clients which did not take part in chunked
+transfers and sends them the whole message, see :class:`Assembler`.
+"""
+import asyncio
+import base64
+import math
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import orjson
+
+from .binary import MSGPACK, Packed, unpack_body
+from .compression import algorithm_of, decompress
+
+CHUNK_KEY = "chunk"
+
+# The chunk is the first field of the body of a chunk, encoded by either codec
+_PREFIXES = (b'{"chunk":', b"\x82\xa5chunk")
+
+
+def split(header: Dict[str, Any], body: Union[bytes, Packed], chunk_size: int, text: bool = True) -> Optional[List[Dict[str, Any]]]:
+    """
+    Splits the encoded body of a message to its chunks, each holding ``header``.
+    Returns None if the body fits in a single chunk. If ``text`` is True, the pieces are base64 strings.
+    """
+    raw = body.buffer if isinstance(body, Packed) else body
+    if len(raw) <= chunk_size:
+        return None
+
+    transfer_id = uuid.uuid4().hex
+    count = math.ceil(len(raw) / chunk_size)
+    chunks = []
+    for seq in range(count):
+        piece = bytes(raw[seq * chunk_size:(seq + 1) * chunk_size])
+        meta = {"id": transfer_id, "seq": seq, "count": count}
+        if isinstance(body, Packed):
+            meta["codec"] = MSGPACK
+        chunks.append({
+            **header,
+            CHUNK_KEY: meta,
+            "data": base64.b64encode(piece).decode("ascii") if text else piece
+        })
+    return chunks
+
+
+def is_chunk(body: Union[bytes, Packed]) -> bool:
+    """
+    Returns True if the raw body of a frame is the body of a chunk, without decoding it.
+    """
+    raw = body.buffer if isinstance(body, Packed) else body
+    if isinstance(raw, str):
+        return raw.startswith(_PREFIXES[0].decode("ascii"))
+    return bytes(raw[:9]).startswith(_PREFIXES)
+
+
+def join(pieces: List[bytes], meta: Dict[str, Any]) -> Union[bytes, Packed]:
+    """
+    Joins the pieces of a message to its encoded body, a :class:`~winerp.lib.binary.Packed` body
+    if it was encoded with the ``msgpack`` codec.
+    """
+    raw = b"".join(pieces)
+    return Packed(raw) if meta.get("codec") == MSGPACK else raw
+
+
+def load(body: Union[bytes, Packed]) -> Dict[str, Any]:
+    """
+    Decodes a body returned by :func:`join`.
+    """
+    if algorithm_of(body) is not None:
+        body = decompress(body)
+    return unpack_body(body) if isinstance(body, Packed) else orjson.loads(body)
+
+
+def _piece(data) -> bytes:
+    return base64.b64decode(data) if isinstance(data, str) else data
+
+
+class _Transfer:
+    __slots__ = ("header", "meta", "pieces", "received", "size", "handle")
+
+    def __init__(self, header, meta, handle):
+        self.header = header
+        self.meta = meta
+        self.pieces: List[Optional[bytes]] = [None] * meta["count"]
+        self.received = 0
+        self.size = 0
+        self.handle = handle
+
+
+class Reassembler:
+    """
+    Reassembles the chunked messages received by a :class:`~winerp.client.Client`.
+
+    Parameters
+    -----------
+    max_size: :class:`int`
+        The number of bytes which can be buffered for all the incomplete messages.
+        A chunk which does not fit drops its message, the following chunks of the message are ignored.
+    timeout: :class:`float`
+        The time in seconds after which an incomplete message is dropped, counted from its first chunk.
+    on_expire: Callable[[:class:`dict`], None]
+        Called with the header of a message dropped after ``timeout``.
+    """
+
+    def __init__(self, max_size: int, timeout: float, on_expire: Callable[[Dict[str, Any]], None]):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.size = 0
+        self.__on_expire = on_expire
+        # (uuid, transfer id) -> transfer
+        self.__transfers: Dict[Tuple[Optional[str], str], _Transfer] = {}
+        # keys of the dropped transfers, until their remaining chunks are no longer expected
+        self.__dropped = set()
+
+    def add(self, message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Adds a chunk. Returns the reassembled message once every chunk of it is received, None otherwise.
+
+        Raises
+        -------
+            ValueError
+                The chunk does not fit in the buffer, its message is dropped.
+        """
+        meta = message.pop(CHUNK_KEY)
+        piece = _piece(message.pop("data"))
+        # The server sends a coalesced response to each waiter under its own uuid but with the same transfer id
+        key = (message.get("uuid"), meta["id"])
+        if key in self.__dropped:
+            return None
+        transfer = self.__transfers.get(key)
+        if transfer is None:
+            handle = asyncio.get_running_loop().call_later(self.timeout, self.__expire, key)
+            transfer = self.__transfers[key] = _Transfer(message, meta, handle)
+
+        if self.size + len(piece) > self.max_size:
+            self.__drop(key)
+            self.__dropped.add(key)
+            asyncio.get_running_loop().call_later(self.timeout, self.__dropped.discard, key)
+            raise ValueError("Chunked message does not fit in the reassembly buffer")
+        if transfer.pieces[meta["seq"]] is None:
+            transfer.pieces[meta["seq"]] = piece
+            transfer.received += 1
+            transfer.size += len(piece)
+            self.size += len(piece)
+        if transfer.received < len(transfer.pieces):
+            return None
+
+        self.__drop(key)
+        transfer.header.update(load(join(transfer.pieces, transfer.meta)))
+        return transfer.header
+
+    def __drop(self, key):
+        transfer = self.__transfers.pop(key)
+        transfer.handle.cancel()
+        self.size -= transfer.size
+        return transfer
+
+    def __expire(self, key):
+        self.__on_expire(self.__drop(key).header)
+
+
+class Assembler:
+    """
+    Joins the chunks sent to the clients which did not take part in chunked transfers,
+    kept by the :class:`~winerp.server.Server`. The pieces are joined to the encoded body of the message,
+    which is not decoded.
+
+    Parameters
+    -----------
+    max_size: :class:`int`
+        The number of bytes which can be buffered for all the incomplete messages. Defaults to 256 MiB.
+        A chunk which does not fit drops its message, the following chunks of the message are ignored.
+    timeout: :class:`float`
+        The time in seconds after which an incomplete message is dropped, counted from its first chunk.
+        Defaults to 30.
+    """
+
+    def __init__(self, max_size: int = 268435456, timeout: float = 30):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.size = 0
+        # (connection id, uuid, transfer id) -> (transfer, expiry)
+        self.__transfers: Dict[Tuple[int, Optional[str], str], Tuple[_Transfer, float]] = {}
+
+    def add(self, connection_id: int, header: Dict[str, Any], body: Dict[str, Any]) -> Optional[Union[bytes, Packed]]:
+        """
+        Adds a chunk sent to a connection, ``body`` being the decoded body of the chunk.
+        Returns the encoded body of the message once every chunk of it is received, None otherwise.
+        """
+        now = time.monotonic()
+        for key in [key for key, (_, expiry) in self.__transfers.items() if expiry <= now]:
+            self.__drop(key)
+
+        meta = body[CHUNK_KEY]
+        piece = _piece(body["data"])
+        key = (connection_id, header.get("uuid"), meta["id"])
+        if key not in self.__transfers:
+            if meta["seq"] != 0:
+                # The message was dropped or its first chunk was lost
+                return None
+            self.__transfers[key] = (_Transfer(header, meta, None), now + self.timeout)
+        transfer = self.__transfers[key][0]
+
+        if self.size + len(piece) > self.max_size:
+            self.__drop(key)
+            return None
+        if transfer.pieces[meta["seq"]] is None:
+            transfer.pieces[meta["seq"]] = piece
+            transfer.received += 1
+            transfer.size += len(piece)
+            self.size += len(piece)
+        if transfer.received < len(transfer.pieces):
+            return None
+
+        self.__drop(key)
+        return join(transfer.pieces, transfer.meta)
+
+    def drop(self, connection_id: int):
+        """
+        Drops the incomplete messages sent to a lost connection.
+        """
+        for key in [key for key in self.__transfers if key[0] == connection_id]:
+            self.__drop(key)
+
+    def __drop(self, key):
+        transfer, _ = self.__transfers.pop(key)
+        self.size -= transfer.size
@@ -0,0 +1,330 @@
+import abc
+import asyncio
+import logging
+import os
+import socket
+import struct
+from typing import Dict, Iterable, List, Optional
+
+import orjson
+
+from .binary import Packed
+from .registry import RouteRegistry
+
+logger = logging.getLogger(__name__)
+
+_SIZES = struct.Struct(">II")
+
+
+def _noop(*args, **kwargs):
+    pass
+
+
+def _frame(control, body=None) -> bytes:
+    control = orjson.dumps(control)
+    if body is None:
+        body = b""
+    elif isinstance(body, str):
+        body = body.encode("utf-8")
+    return _SIZES.pack(len(control), len(body)) + control + body
+
+
+class Cluster(abc.ABC):
+    """
+    Links a :class:`~winerp.server.Server` to other servers.
+    This class can't be used directly, see :class:`WorkerCluster` and :class:`MeshCluster`.
+
+    Linked servers announce the local names of their verified clients and the routes they provide to each other,
+    so each server knows which peer a local name lives on, and forward routed frames to the peer holding the destination.
+    The body of a forwarded frame is passed along as-is, whatever its codec.
+
+    A link is a stream carrying frames made of the sizes of a control header and a body,
+    followed by the JSON control header and the raw body. Both ends of a link start by sending
+    a ``hello`` followed by the local names of their clients. The frames sent to a peer are queued
+    and written by a task of the link, which waits for the stream to drain after each frame.
+
+    Parameters
+    -----------
+    name: :class:`str`
+        The name of this server in the cluster. This should be unique to all the linked servers.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        # local name -> name of the peer it is connected to
+        self.locations: Dict[str, str] = {}
+        # the routes provided by the local names of the peers
+        self.registry = RouteRegistry()
+        # peer -> queue of the frames to send to it
+        self.__writers: Dict[str, asyncio.Queue] = {}
+        self.__streams = set()
+        self.__tasks = set()
+        # the server listening for the peers, if any
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.local_names = tuple
+        self.local_routes = _noop
+        self.on_leave = _noop
+        self.on_deliver = _noop
+
+    @property
+    def peers(self) -> List[str]:
+        """
+        List[:class:`str`]: Returns the names of the linked peers.
+        """
+        return list(self.__writers)
+
+    def set_fn_local_names(self, fn):
+        self.local_names = fn
+
+    def set_fn_local_routes(self, fn):
+        """
+        Sets a function returning the routes provided by a local name of this server.
+        """
+        self.local_routes = fn
+
+    def set_fn_leave(self, fn):
+        self.on_leave = fn
+
+    def set_fn_deliver(self, fn):
+        self.on_deliver = fn
+
+    @abc.abstractmethod
+    async def start(self):
+        """|coro|
+
+        Starts linking to the peers.
+        """
+
+    def close(self):
+        """
+        Stops listening for the peers and closes the links. Must be called from the event loop.
+        """
+        if self._server is not None:
+            self._server.close()
+        for task in list(self.__tasks):
+            task.cancel()
+        for writer in self.__streams:
+            writer.close()
+
+    def _spawn(self, coro):
+        # The tasks are referenced until they are done, so they are not garbage collected
+        task = asyncio.get_running_loop().create_task(coro)
+        self.__tasks.add(task)
+        task.add_done_callback(self.__tasks.discard)
+
+    async def _accept(self, reader, writer):
+        await self._link(reader, writer, initiator=False)
+
+    async def _link(self, reader, writer, initiator: bool):
+        peer = None
+        queue = asyncio.Queue()
+        sender = None
+        self.__streams.add(writer)
+        try:
+            if initiator:
+                await self.__write(writer, {"op": "hello", "peer": self.name})
+            while True:
+                control_size, body_size = _SIZES.unpack(await reader.readexactly(_SIZES.size))
+                control = orjson.loads(await reader.readexactly(control_size))
+                body = memoryview(await reader.readexactly(body_size)) if body_size else None
+                if control["op"] == "hello":
+                    peer = control["peer"]
+                    if not initiator:
+                        await self.__write(writer, {"op": "hello", "peer": self.name})
+                    # The local names are queued before the link is used, so they are sent first
+                    for name in self.local_names():
+                        routes = sorted(self.local_routes(name) or ())
+                        queue.put_nowait(_frame({"op": "join", "name": name, "routes": routes}))
+                    self.__writers[peer] = queue
+                    sender = asyncio.get_running_loop().create_task(self.__drain(writer, queue))
+                    logger.info("Linked to %s" % peer)
+                elif peer is not None:
+                    self.__handle(peer, control, body)
+        except (asyncio.IncompleteReadError, OSError):
+            pass
+        finally:
+            if sender is not None:
+                sender.cancel()
+            self.__streams.discard(writer)
+            writer.close()
+            if peer is not None and self.__writers.get(peer) is queue:
+                logger.warning("Lost the link to %s" % peer)
+                del self.__writers[peer]
+                for name in [name for name, location in self.locations.items() if location == peer]:
+                    del self.locations[name]
+                    self.registry.unregister(name)
+                    self.on_leave(name)
+
+    def __handle(self, peer, control, body):
+        op = control["op"]
+        if op == "join":
+            self.locations[control["name"]] = peer
+            self.registry.register(control["name"], control.get("routes") or ())
+        elif op == "routes":
+            if self.locations.get(control["name"]) == peer:
+                self.registry.register(control["name"], control["routes"])
+        elif op == "leave":
+            if self.locations.get(control["name"]) == peer:
+                del self.locations[control["name"]]
+                self.registry.unregister(control["name"])
+                self.on_leave(control["name"])
+        elif op == "deliver":
+            if control.get("packed"):
+                body = Packed(body)
+            self.on_deliver(control["targets"], control["exclude"], control["header"], body)
+
+    async def __write(self, writer, control):
+        writer.write(_frame(control))
+        await writer.drain()
+
+    async def __drain(self, writer, queue):
+        # A slow peer holds the frames in the queue instead of the buffer of the stream
+        try:
+            while True:
+                writer.write(await queue.get())
+                await writer.drain()
+        except OSError:
+            writer.close()
+
+    def __send(self, peer, control, body=None):
+        queue = self.__writers.get(peer)
+        if queue is not None:
+            if isinstance(body, Packed):
+                control["packed"] = True
+                body = body.buffer
+            queue.put_nowait(_frame(control, body))
+
+    def join(self, name: str, routes: Iterable[str] = ()):
+        """
+        Announces a local name verified on this server, with the routes it provides.
+        """
+        for peer in self.__writers:
+            self.__send(peer, {"op": "join", "name": name, "routes": sorted(routes)})
+
+    def advertise(self, name: str, routes: Iterable[str]):
+        """
+        Announces the new routes provided by a local name already announced.
+        """
+        for peer in self.__writers:
+            self.__send(peer, {"op": "routes", "name": name, "routes": sorted(routes)})
+
+    def leave(self, name: str):
+        """
+        Announces a local name which is no longer connected to this server.
+        """
+        for peer in self.__writers:
+            self.__send(peer, {"op": "leave", "name": name})
+
+    def deliver(self, names: Iterable[str], header: dict, body):
+        """
+        Forwards a frame to the peers holding ``names``. Names which are not known are skipped.
+        """
+        targets = {}
+        for name in names:
+            peer = self.locations.get(name)
+            if peer is not None:
+                targets.setdefault(peer, []).append(name)
+        for peer, names in targets.items():
+            self.__send(peer, {"op": "deliver", "targets": names, "exclude": None, "header": header}, body)
+
+    def broadcast(self, header: dict, body, exclude: Optional[str] = None):
+        """
+        Forwards a frame to every client of every peer, except ``exclude``.
+        """
+        for peer in self.__writers:
+            self.__send(peer, {"op": "deliver", "targets": None, "exclude": exclude, "header": header}, body)
+
+
+class WorkerCluster(Cluster):
+    """
+    Links the worker processes of a sharded :class:`~winerp.server.Server` together.
+    Every worker listens on its own unix socket inside ``socket_dir`` and connects to the workers started before it.
+
+    Parameters
+    -----------
+    index: :class:`int`
+        The index of this worker.
+    count: :class:`int`
+        The number of workers in the cluster.
+    socket_dir: :class:`str`
+        The directory holding the unix sockets of the workers.
+    """
+
+    def __init__(self, index: int, count: int, socket_dir: str):
+        super().__init__("worker-%s" % index)
+        self.index = index
+        self.count = count
+        self.socket_dir = socket_dir
+
+    def socket_path(self, index: int) -> str:
+        return os.path.join(self.socket_dir, "worker-%s.sock" % index)
+
+    async def start(self, timeout: float = 10):
+        self._server = await asyncio.start_unix_server(self._accept, path=self.socket_path(self.index))
+        deadline = asyncio.get_running_loop().time() + timeout
+        for index in range(self.index):
+            while True:
+                try:
+                    reader, writer = await asyncio.open_unix_connection(self.socket_path(index))
+                    break
+                except (FileNotFoundError, ConnectionRefusedError):
+                    if asyncio.get_running_loop().time() > deadline:
+                        raise ConnectionError("Worker %s did not start in time" % index) from None
+                    await asyncio.sleep(0.05)
+            self._spawn(self._link(reader, writer, initiator=True))
+
+
+class MeshCluster(Cluster):
+    """
+    Links federated :class:`~winerp.server.Server` instances, usually running on different hosts.
+    A request between two clients connected to the same server stays on that server,
+    only the traffic between clients of different servers goes through the mesh.
+
+    Every server must be linked to every other server of the mesh, a link is used in both directions
+    so it is enough for one of the two servers to list the other as a peer.
+    Lost links are retried every ``retry`` seconds.
+
+    Parameters
+    -----------
+    host: :class:`str`
+        The host to listen on for the peers.
+    port: Optional[:class:`int`]
+        The port to listen on for the peers. If ``None``, the server only connects to its peers.
+    peers: List[:class:`str`]
+        The addresses of the peers as ``host:port``.
+    name: Optional[:class:`str`]
+        The name of this server in the mesh. Defaults to ``hostname:port``, with the port of the peers.
+    retry: Optional[:class:`float`]
+        The time in seconds between two attempts to link to a peer. Defaults to 1.
+    """
+
+    def __init__(
+            self,
+            host: str,
+            port: Optional[int],
+            peers: List[str],
+            name: Optional[str] = None,
+            retry: float = 1
+    ):
+        super().__init__(name or "%s:%s" % (socket.gethostname(), port))
+        self.host = host
+        self.port = port
+        self.addresses = list(peers)
+        self.retry = retry
+
+    async def start(self):
+        if self.port is not None:
+            self._server = await asyncio.start_server(self._accept, self.host, self.port)
+        for address in self.addresses:
+            host, port = address.rsplit(":", 1)
+            self._spawn(self.__keep_linked(host, int(port)))
+
+    async def __keep_linked(self, host, port):
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(host, port)
+            except OSError as error:
+                logger.debug("Failed to link to %s:%s. %s", host, port, str(error))
+            else:
+                await self._link(reader, writer, initiator=True)
+            await asyncio.sleep(self.retry)
@@ -0,0 +1,110 @@
+"""
+Coalescing of the identical requests sent by different clients to a route marked as coalescible.
+
+A client marks its coalescible routes in the data of its verification::
+
+    {"codec":"json",...,"coalesce":["get_config"]}
+
+The server forwards the first request to such a route and holds the identical requests which arrive before
+its response. The response is then sent to every requester, each under the uuid of its own request.
+Two requests are identical if they have the same destination, route, keyword arguments and routing key.
+The requests are coalesced by the server the destination is connected to, so the requests forwarded
+by the other workers or the peers of a mesh are coalesced with the requests of its own clients.
+"""
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+
+from .binary import json_default
+
+Key = Tuple[str, str, bytes, Optional[str]]
+# (local name of the requester, uuid of its request)
+Waiter = Tuple[str, str]
+
+
+def key(destination: str, route: str, body: Dict[str, Any], routing_key: Any = None) -> Optional[Key]:
+    """
+    Returns the key of a request from its decoded body, None if the request can't be coalesced.
+    Streams, chunks and messages sent through shared memory or in a batch are never coalesced.
+    """
+    if len(body.keys() - {"data", "traceback", "pseudo_object"}) > 0:
+        return None
+    try:
+        data = orjson.dumps(
+            body.get("data"),
+            option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS,
+            default=json_default
+        )
+    except TypeError:
+        return None
+    return destination, route, data, None if routing_key is None else str(routing_key)
+
+
+class Coalescer:
+    """
+    The requests forwarded by a :class:`~winerp.server.Server` which identical requests are waiting for.
+
+    Parameters
+    -----------
+    timeout: :class:`float`
+        The time in seconds after which a request is assumed to be lost,
+        the next identical request is forwarded. Defaults to 60, the default timeout of a request.
+    max_flights: :class:`int`
+        The number of requests tracked. The oldest request is forgotten when there are more. Defaults to 65536.
+    """
+
+    def __init__(self, timeout: float = 60, max_flights: int = 65536):
+        self.timeout = timeout
+        self.max_flights = max_flights
+        # key -> (uuid of the forwarded request, start time)
+        self.__flights: Dict[Key, Tuple[str, float]] = {}
+        # uuid of the forwarded request -> (key, waiters)
+        self.__waiters: Dict[str, Tuple[Key, List[Waiter]]] = {}
+
+    def join(self, key: Key, requester: str, uuid: str) -> bool:
+        """
+        Adds a request to the waiters of the identical request, returns False if there is none in flight.
+        """
+        flight = self.__flights.get(key)
+        if flight is None:
+            return False
+        leader, start = flight
+        if time.monotonic() - start > self.timeout:
+            self.land(leader)
+            return False
+        self.__waiters[leader][1].append((requester, uuid))
+        return True
+
+    def start(self, key: Key, uuid: str):
+        """
+        Tracks a forwarded request, identical requests can join it until it lands.
+        """
+        while len(self.__flights) >= self.max_flights:
+            self.land(next(iter(self.__flights.values()))[0])
+        self.__flights[key] = (uuid, time.monotonic())
+        self.__waiters[uuid] = (key, [])
+
+    def waiting(self, uuid: str) -> bool:
+        """
+        Returns True if the response to the request ``uuid`` is expected by waiters.
+        """
+        return uuid in self.__waiters
+
+    def waiters(self, uuid: str) -> List[Waiter]:
+        """
+        Returns the waiters of a request, which is still in flight.
+        """
+        return self.__waiters[uuid][1] if uuid in self.__waiters else []
+
+    def land(self, uuid: str) -> List[Waiter]:
+        """
+        Stops tracking a request and returns its waiters.
+        """
+        entry = self.__waiters.pop(uuid, None)
+        if entry is None:
+            return []
+        flight_key, waiters = entry
+        if self.__flights.get(flight_key, (None,))[0] == uuid:
+            del self.__flights[flight_key]
+        return waiters
@@ -0,0 +1,101 @@
+"""
+Compression of the bodies of the frames, negotiated per connection during the verification.
+
+Only the body of a frame is compressed, so the server can still route it from its header.
+A compressed body starts with the tag of its algorithm and the size of the raw body,
+followed by the compressed raw body::
+
+    \\x01 | raw size (4 bytes, big endian) | zlib stream
+
+The tags are never the first byte of a JSON or a ``msgpack`` body, so compressed bodies are recognized
+without any other marker. Frames holding a compressed body are binary frames.
+"""
+import struct
+import zlib
+from typing import Tuple, Union
+
+from .binary import Packed
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ZLIB = "zlib"
+ZSTD = "zstd"
+ALGORITHMS = (ZLIB, ZSTD)
+
+TAGS = {ZLIB: 0x01, ZSTD: 0x02}
+_ALGORITHM_OF_TAG = {tag: algorithm for algorithm, tag in TAGS.items()}
+_HEAD = struct.Struct(">BI")
+
+
+def available() -> Tuple[str, ...]:
+    """
+    Returns the algorithms which can be used with the installed packages.
+    """
+    if zstandard is None:
+        return (ZLIB,)
+    return ALGORITHMS
+
+
+def _buffer(body):
+    return body.buffer if isinstance(body, Packed) else body
+
+
+def algorithm_of(body) -> Union[str, None]:
+    """
+    Returns the algorithm a raw body is compressed with, or None if it is not compressed.
+    """
+    buffer = _buffer(body)
+    if body is None or isinstance(buffer, str) or len(buffer) == 0:
+        return None
+    return _ALGORITHM_OF_TAG.get(buffer[0])
+
+
+def raw_size(body) -> int:
+    """
+    Returns the size of a compressed body once decompressed.
+    """
+    return _HEAD.unpack_from(_buffer(body))[1]
+
+
+def compress(body, algorithm: str):
+    """
+    Compresses a raw JSON body or a :class:`~winerp.lib.binary.Packed` body.
+    """
+    buffer = _buffer(body)
+    if isinstance(buffer, str):
+        buffer = buffer.encode("utf-8")
+    if algorithm == ZSTD:
+        compressed = zstandard.ZstdCompressor().compress(buffer)
+    else:
+        compressed = zlib.compress(buffer, 6)
+    compressed = _HEAD.pack(TAGS[algorithm], len(buffer)) + compressed
+    return Packed(compressed) if isinstance(body, Packed) else compressed
+
+
+def decompress(body):
+    """
+    Decompresses a body returned by :func:`compress`.
+
+    Raises
+    -------
+        ValueError
+            The body does not decompress to its announced size.
+    """
+    buffer = _buffer(body)
+    tag, size = _HEAD.unpack_from(buffer)
+    data = memoryview(buffer)[_HEAD.size:]
+    if tag == TAGS[ZSTD]:
+        if zstandard is None:
+            raise ValueError("zstandard is not installed")
+        raw = zstandard.ZstdDecompressor().decompress(data, max_output_size=size)
+    else:
+        decompressor = zlib.decompressobj()
+        raw = decompressor.decompress(data, size)
+        if decompressor.unconsumed_tail:
+            raise ValueError("Compressed body is larger than announced")
+    if len(raw) != size:
+        raise ValueError("Compressed body does not match its announced size")
+    return Packed(raw) if isinstance(body, Packed) else raw
@@ -0,0 +1,76 @@
+"""
+The wire envelope used between the clients and the server.
+
+A frame is made of a small JSON header holding the routing fields, a newline and the
+JSON body holding everything else::
+
+    {"type":2,"id":"a","destination":"b","uuid":"...","route":"get_data"}
+    {"data":{...},"traceback":null,"pseudo_object":null}
+
+JSON encoded by ``orjson`` never contains a raw newline, so the server can parse the
+header on its own and forward the body as-is. Frames without a newline are legacy frames,
+a single JSON object holding every field.
+"""
+from typing import Any, Dict, Optional, Tuple, Union
+
+import orjson
+
+HEADER_FIELDS = ("type", "id", "destination", "uuid", "route", "key")
+
+
+def partition(message: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Partitions a message ``dict`` to its header and its body.
+    """
+    header = {}
+    body = {}
+    for key, value in message.items():
+        if key in HEADER_FIELDS:
+            header[key] = value
+        else:
+            body[key] = value
+    return header, body
+
+
+def encode(message: Dict[str, Any]) -> bytes:
+    """
+    Encodes a message ``dict`` to a frame.
+    """
+    header, body = partition(message)
+    return orjson.dumps(header) + b"\n" + orjson.dumps(body)
+
+
+def split(frame: Union[str, bytes]) -> Tuple[Dict[str, Any], Optional[Union[str, memoryview]]]:
+    """
+    Splits a frame to its parsed header and its raw body. The body is left undecoded.
+
+    For legacy frames, the header holds every field of the message and the body is ``None``.
+    The body of a ``bytes`` frame is a :class:`memoryview`, so it is not copied.
+    """
+    if isinstance(frame, str):
+        index = frame.find("\n")
+    else:
+        index = frame.find(b"\n")
+        frame = memoryview(frame)
+    if index == -1:
+        return orjson.loads(frame), None
+    return orjson.loads(frame[:index]), frame[index + 1:]
+
+
+def join(header: Dict[str, Any], body: Union[str, bytes, memoryview]) -> Union[str, bytes]:
+    """
+    Joins a header to a raw body returned by :func:`split`. The body is not re-encoded.
+    """
+    if isinstance(body, str):
+        return orjson.dumps(header).decode("utf-8") + "\n" + body
+    return orjson.dumps(header) + b"\n" + body
+
+
+def decode(frame: Union[str, bytes]) -> Dict[str, Any]:
+    """
+    Decodes a frame, either enveloped or legacy, to a message ``dict``.
+    """
+    header, body = split(frame)
+    if body is not None:
+        header.update(orjson.loads(body))
+    return header
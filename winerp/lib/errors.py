@@ -31,3 +31,8 @@ class ClientRuntimeError(Exception):
 class ClientNotReadyError(Exception):
     """Raised when the client is not ready to send requests"""
     pass
+
+
+class EncodingError(Exception):
+    """Raised when the server can't encode a message with the codec of its destination."""
+    pass
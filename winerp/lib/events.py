@@ -28,6 +28,7 @@ class Events:
             "on_winerp_request",
             "on_winerp_response",
             "on_winerp_information",
+            "on_winerp_publication",
             "on_winerp_error"
         ]
         self._logger: Logger = logger
@@ -106,6 +107,7 @@ class Events:
             | ``on_winerp_request``: The server sent new request.
             | ``on_winerp_response``: The server sent back a response to a previous request.
             | ``on_winerp_information``: The server sent some data sourced by a client.
+            | ``on_winerp_publication``: The server sent some data published to a topic the client subscribed to.
             | ``on_winerp_error``: An error occured during request processing.
 
         Raises
@@ -0,0 +1,80 @@
+"""
+The requests forwarded by the :class:`~winerp.server.Server` which are waiting for a response, kept per connection.
+
+When a connection is lost, its requests are not left to time out on the requesters.
+The requests to the routes the serving client marked as idempotent, in the data of its verification
+or of an :attr:`~winerp.lib.payload.Payloads.advertisement`, are sent again to the connection taking its place,
+the promoted on hold client or another replica of its worker group::
+
+    {"data":{"routes":["get_config","ban"],"idempotent":["get_config"]}}
+
+The others are answered at once with an error, as the client may have started serving them.
+The coalescible routes are assumed to be idempotent as well.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# (header, raw body) of a frame of a request, a chunked request has several
+Frame = Tuple[Dict[str, Any], Any]
+
+
+class OutstandingRequests:
+    """
+    The frames of the requests forwarded to each connection, until the first frame of their response.
+
+    Parameters
+    -----------
+    max_tracked: :class:`int`
+        The number of requests tracked. The oldest request is forgotten when there are more,
+        it then times out on its requester if its destination is lost. Defaults to 65536.
+    """
+
+    def __init__(self, max_tracked: int = 65536):
+        self.max_tracked = max_tracked
+        # uuid -> connection id the request was forwarded to
+        self.__owners: "OrderedDict[str, int]" = OrderedDict()
+        # connection id -> uuid -> (header of the request, its frames or None if it can't be sent again)
+        self.__requests: Dict[int, Dict[str, Tuple[Dict[str, Any], Optional[List[Frame]]]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.__owners)
+
+    def track(self, connection_id: int, header: Dict[str, Any], body: Any, replayable: bool):
+        """
+        Tracks a frame of a request forwarded to ``connection_id``. Only the frames of
+        a ``replayable`` request are kept.
+        """
+        uuid = header.get("uuid")
+        if uuid is None:
+            return
+        requests = self.__requests.setdefault(connection_id, {})
+        if uuid not in requests:
+            while len(self.__owners) >= self.max_tracked:
+                self.answered(next(iter(self.__owners)))
+            self.__owners[uuid] = connection_id
+            requests[uuid] = (dict(header), [] if replayable else None)
+        frames = requests[uuid][1]
+        if frames is not None:
+            frames.append((dict(header), body))
+
+    def answered(self, uuid: Optional[str]):
+        """
+        Stops tracking the request ``uuid``, its response started.
+        """
+        connection_id = self.__owners.pop(uuid, None)
+        if connection_id is None:
+            return
+        requests = self.__requests[connection_id]
+        del requests[uuid]
+        if not requests:
+            del self.__requests[connection_id]
+
+    def drop(self, connection_id: int) -> List[Tuple[Dict[str, Any], Optional[List[Frame]]]]:
+        """
+        Stops tracking the requests of a lost connection and returns their headers and frames,
+        in the order they were forwarded. The frames are None for the requests which can't be sent again.
+        """
+        requests = self.__requests.pop(connection_id, {})
+        for uuid in requests:
+            del self.__owners[uuid]
+        return list(requests.values())
@@ -0,0 +1,185 @@
+"""
+Worker groups, several connections of clients sharing a local name which are all active.
+
+A client joins a group with the ``group`` flag in the data of its verification::
+
+    {"codec":"json",...,"group":true}
+
+The :class:`~winerp.server.Server` spreads the requests to the name across the replicas of the group.
+The other messages to the name, like informs and publications, are sent to a single replica.
+The messages about a request, like its chunks and the flow control of a stream, follow the request to its replica,
+and the responses to the requests sent by a replica are sent back to it.
+
+A request sent with a routing key is sent to the replica owning the key, so the requests about
+the same key reach the same replica. A replica owns the keys it declares in the ``shards`` of its verification,
+the other keys are spread across the replicas with consistent hashing, by the ``member`` identity of each replica::
+
+    {"codec":"json",...,"group":true,"member":"shard-3","shards":[3]}
+
+When a replica joins or leaves the group, only the keys it owns move.
+A replica keeping its ``member`` identity across reconnections gets back the same keys.
+"""
+import bisect
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+ROUND_ROBIN = "round_robin"
+LEAST_OUTSTANDING = "least_outstanding"
+STRATEGIES = (ROUND_ROBIN, LEAST_OUTSTANDING)
+# The points of a replica on the hash ring, more points spread the keys more evenly
+VIRTUAL_NODES = 64
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class ReplicaGroup:
+    """
+    The replicas of a local name.
+
+    Parameters
+    -----------
+    strategy: :class:`str`
+        How a request is assigned to a replica, either ``round_robin`` or ``least_outstanding``,
+        to the replica with the fewest requests waiting for a response.
+    max_tracked: :class:`int`
+        The number of request uuids tracked. The oldest uuid is forgotten when there are more. Defaults to 65536.
+    """
+
+    def __init__(self, strategy: str, max_tracked: int = 65536):
+        self.strategy = strategy
+        self.max_tracked = max_tracked
+        # the connection dicts of the replicas, {"client", "id"}
+        self.replicas: List[Dict[str, Any]] = []
+        # connection id -> requests forwarded to the replica and waiting for a response
+        self.outstanding: Dict[int, int] = {}
+        self.__next = 0
+        # uuid -> connection id of the replica the messages about the request are sent to
+        self.__affinity: "OrderedDict[str, int]" = OrderedDict()
+        # uuids of the requests counted in outstanding
+        self.__pending = set()
+        # connection id -> (member identity, declared shards)
+        self.__members: Dict[int, Tuple[str, List[str]]] = {}
+        # shard -> connection id of the replica which declared it
+        self.__shards: Dict[str, int] = {}
+        # sorted (point, connection id) of the replicas on the hash ring
+        self.__ring: List[Tuple[int, int]] = []
+
+    def __len__(self) -> int:
+        return len(self.replicas)
+
+    def add(self, connection: Dict[str, Any], member: Optional[str] = None, shards: Iterable[Hashable] = ()):
+        """
+        Adds a replica, identified by ``member`` on the hash ring, or by its connection id if None,
+        and owning the keys in ``shards``.
+        """
+        self.replicas.append(connection)
+        self.outstanding[connection["id"]] = 0
+        member = str(connection["id"]) if member is None else str(member)
+        self.__members[connection["id"]] = (member, [str(shard) for shard in shards])
+        self.__rebuild()
+
+    def remove(self, connection_id: int) -> List[str]:
+        """
+        Removes a replica and returns the uuids of the requests it had not answered.
+        Returns an empty list if it is not a replica of the group.
+        """
+        if connection_id not in self.outstanding:
+            return []
+        self.replicas = [replica for replica in self.replicas if replica["id"] != connection_id]
+        del self.outstanding[connection_id]
+        del self.__members[connection_id]
+        self.__rebuild()
+        lost = [uuid for uuid, owner in self.__affinity.items() if owner == connection_id]
+        for uuid in lost:
+            del self.__affinity[uuid]
+        unanswered = [uuid for uuid in lost if uuid in self.__pending]
+        self.__pending.difference_update(lost)
+        return unanswered
+
+    def __contains__(self, connection_id: int) -> bool:
+        return connection_id in self.outstanding
+
+    def bind(self, uuid: Optional[str], connection_id: int):
+        """
+        Sends the messages about the request ``uuid`` to the replica ``connection_id``.
+        """
+        if uuid is None or uuid in self.__affinity:
+            return
+        while len(self.__affinity) >= self.max_tracked:
+            self.__forget(next(iter(self.__affinity)))
+        self.__affinity[uuid] = connection_id
+
+    def route(self, uuid: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Returns the replica bound to the request ``uuid``, None if it is not bound to any.
+        """
+        connection_id = self.__affinity.get(uuid)
+        if connection_id is None:
+            return None
+        for replica in self.replicas:
+            if replica["id"] == connection_id:
+                return replica
+        return None
+
+    def owner(self, key: Hashable) -> Dict[str, Any]:
+        """
+        Returns the replica owning ``key``, the replica which declared it as a shard if any,
+        else the next replica on the hash ring.
+        """
+        key = str(key)
+        connection_id = self.__shards.get(key)
+        if connection_id is None:
+            index = bisect.bisect(self.__ring, (_hash(key),)) % len(self.__ring)
+            connection_id = self.__ring[index][1]
+        for replica in self.replicas:
+            if replica["id"] == connection_id:
+                return replica
+
+    def pick(self, uuid: Optional[str], key: Optional[Hashable] = None) -> Dict[str, Any]:
+        """
+        Returns the replica a request is forwarded to, the replica already bound to it if any,
+        else the replica owning its routing ``key`` if set.
+        """
+        replica = self.route(uuid)
+        if replica is not None:
+            return replica
+        if key is not None:
+            replica = self.owner(key)
+        elif self.strategy == LEAST_OUTSTANDING:
+            replica = min(self.replicas, key=lambda connection: self.outstanding[connection["id"]])
+        else:
+            self.__next = (self.__next + 1) % len(self.replicas)
+            replica = self.replicas[self.__next]
+        if uuid is not None:
+            self.bind(uuid, replica["id"])
+            self.__pending.add(uuid)
+            self.outstanding[replica["id"]] += 1
+        return replica
+
+    def answered(self, uuid: Optional[str]):
+        """
+        Stops counting the request ``uuid`` as outstanding, the messages about it still follow it to its replica.
+        """
+        if uuid in self.__pending:
+            self.__pending.discard(uuid)
+            self.outstanding[self.__affinity[uuid]] -= 1
+
+    def __rebuild(self):
+        # The later replicas take over the shards declared twice
+        self.__shards = {
+            shard: connection_id
+            for connection_id, (_, shards) in self.__members.items()
+            for shard in shards
+        }
+        self.__ring = sorted(
+            (_hash("%s#%s" % (member, index)), connection_id)
+            for connection_id, (member, _) in self.__members.items()
+            for index in range(VIRTUAL_NODES)
+        )
+
+    def __forget(self, uuid):
+        self.answered(uuid)
+        del self.__affinity[uuid]
@@ -0,0 +1,125 @@
+"""
+A mesh of :class:`~winerp.server.Server` instances running in the current process on loopback ports,
+to test and benchmark the traffic between clients of different servers on a single host::
+
+    with LoopbackMesh(3) as mesh:
+        client_a = winerp.Client("bot-a", port=mesh.ports[0])
+        client_b = winerp.Client("bot-b", port=mesh.ports[2])
+        ...
+
+The ports are picked by the system, so several meshes can run side by side.
+"""
+import socket
+import threading
+import time
+from typing import List
+
+from ..server import Server
+
+
+def _free_port(host: str) -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+class LoopbackMesh:
+    """
+    Runs ``count`` servers linked in a mesh, each serving its clients on its own loopback port.
+
+    Parameters
+    -----------
+    count: Optional[:class:`int`]
+        The number of servers. Defaults to 2.
+    host: Optional[:class:`str`]
+        The loopback address the servers listen on. Defaults to 127.0.0.1.
+    **options
+        The options passed to every :class:`~winerp.server.Server`, like ``queue_size``.
+        The ``asyncio`` engine is always used.
+    """
+
+    def __init__(self, count: int = 2, host: str = "127.0.0.1", **options):
+        if count < 1:
+            raise ValueError("count should be at least 1")
+        self.host = host
+        self.ports: List[int] = [_free_port(host) for _ in range(count)]
+        self.mesh_ports: List[int] = [_free_port(host) for _ in range(count)]
+        # A link is used in both directions, each server only lists the servers before it as peers
+        self.servers: List[Server] = [
+            Server(
+                host=host,
+                port=port,
+                engine="asyncio",
+                mesh_port=mesh_port,
+                peers=["%s:%s" % (host, peer_port) for peer_port in self.mesh_ports[:index]],
+                **options
+            )
+            for index, (port, mesh_port) in enumerate(zip(self.ports, self.mesh_ports))
+        ]
+        self.__threads: List[threading.Thread] = []
+
+    def __enter__(self) -> "LoopbackMesh":
+        self.start()
+        return self
+
+    def __exit__(self, *_):
+        self.stop()
+
+    def start(self, timeout: float = 10):
+        """
+        Starts the servers and waits until every server accepts clients and is linked to every other server.
+
+        Raises
+        -------
+            TimeoutError
+                The mesh is not ready within ``timeout`` seconds.
+        """
+        for server in self.servers:
+            thread = threading.Thread(target=server.start, daemon=True)
+            thread.start()
+            self.__threads.append(thread)
+
+        deadline = time.monotonic() + timeout
+        while not self.ready:
+            if time.monotonic() > deadline:
+                self.stop()
+                raise TimeoutError("The mesh is not ready after %s seconds" % timeout)
+            time.sleep(0.05)
+
+    @property
+    def ready(self) -> bool:
+        """
+        :class:`bool`: Returns True if every server accepts clients and is linked to every other server.
+        """
+        return all(
+            server.websocket.listening and len(server.cluster.peers) == len(self.servers) - 1
+            for server in self.servers
+        )
+
+    def stop(self, timeout: float = 5):
+        """
+        Stops the servers, their clients are disconnected.
+        """
+        for index in range(len(self.servers)):
+            self.__stop(index)
+        for thread in self.__threads:
+            thread.join(timeout)
+        self.__threads.clear()
+
+    def stop_server(self, index: int, timeout: float = 5):
+        """
+        Stops a single server, its clients are disconnected and the other servers lose the link to it.
+        This waits for the server to close the connections of its clients, so it should not be called
+        from the event loop running them.
+        """
+        self.__stop(index)
+        if self.__threads:
+            self.__threads[index].join(timeout)
+
+    def __stop(self, index):
+        server = self.servers[index]
+        loop = server.websocket.loop
+        if loop is not None and not loop.is_closed():
+            # The links are closed first, so the peers don't see the clients leave one by one
+            loop.call_soon_threadsafe(server.cluster.close)
+            server.websocket.stop()
@@ -48,6 +48,13 @@ class WsMessage:
         """
         return self._message.get("uuid")
     
+    @property
+    def key(self) -> any:
+        """
+        :class:`Any`: Returns the routing key of the request, see :mod:`winerp.lib.groups`.
+        """
+        return self._message.get("key")
+    
     @property
     def data(self) -> any:
         """
@@ -98,6 +105,20 @@ class WsMessage:
         """
         self._message["pseudo_object"] = pseudo_object
 
+    @property
+    def stream(self) -> dict:
+        """
+        :class:`dict`: Returns the stream state of the message, see :mod:`winerp.lib.streams`.
+        """
+        return self._message.get("stream")
+
+    @property
+    def batch(self) -> list:
+        """
+        :class:`list`: Returns the requests of a batch, see :meth:`~winerp.client.Client.request_many`.
+        """
+        return self._message.get("batch")
+
     def to_dict(self) -> dict:
         """
         :class:`dict`: Returns the message as a `dict` type.
@@ -0,0 +1,216 @@
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Callable, Dict, Optional, Tuple
+
+from .payload import Payloads
+
+TYPE_NAMES = {
+    value: name
+    for name, value in vars(Payloads).items()
+    if not name.startswith("_")
+}
+
+# Upper bounds in seconds of the buckets of the latency histograms
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels) -> str:
+    return "{%s}" % ",".join('%s="%s"' % (key, _escape(value)) for key, value in labels.items())
+
+
+class Histogram:
+    """
+    A cumulative histogram of durations in seconds, see :data:`LATENCY_BUCKETS`.
+    """
+
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class Metrics:
+    """
+    Counters kept by a :class:`~winerp.server.Server` about the traffic it serves.
+    Updating a counter is a dictionary lookup, so the metrics are always enabled.
+
+    The request to response latency is measured at the server, from the moment a request is forwarded
+    to the moment the response or the error with the same uuid comes back.
+
+    Parameters
+    -----------
+    max_pending: Optional[:class:`int`]
+        The number of requests waiting for a response which are timed.
+        The oldest request is forgotten when there are more, as it has most likely timed out. Defaults to 65536.
+    """
+
+    def __init__(self, max_pending: int = 65536):
+        self.max_pending = max_pending
+        # (local name, payload type) -> count
+        self.messages_in: Dict[Tuple[str, int], int] = defaultdict(int)
+        self.bytes_in: Dict[Tuple[str, int], int] = defaultdict(int)
+        self.messages_out: Dict[Tuple[str, int], int] = defaultdict(int)
+        self.bytes_out: Dict[Tuple[str, int], int] = defaultdict(int)
+        # error message -> count
+        self.errors: Dict[str, int] = defaultdict(int)
+        # (algorithm, compressed by) -> bytes
+        self.compression_raw: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.compression_compressed: Dict[Tuple[str, str], int] = defaultdict(int)
+        # (algorithm, operation) -> seconds of CPU time spent by the server
+        self.compression_seconds: Dict[Tuple[str, str], float] = defaultdict(float)
+        # (local name, connection id) -> requests forwarded to a replica of a worker group
+        self.replica_requests: Dict[Tuple[str, int], int] = defaultdict(int)
+        # route -> requests held for the response of an identical request
+        self.coalesced: Dict[str, int] = defaultdict(int)
+        # route -> requests sent again to another connection after their destination disconnected
+        self.replayed: Dict[str, int] = defaultdict(int)
+        # route -> histogram
+        self.latency: Dict[str, Histogram] = defaultdict(Histogram)
+        # uuid -> (route, start time)
+        self.__pending: Dict[str, Tuple[str, float]] = {}
+        self.queue_sizes: Callable[[], Dict[str, Tuple[int, int]]] = dict
+        self.replica_loads: Callable[[], Dict[Tuple[str, int], int]] = dict
+
+    def set_fn_queue_sizes(self, fn):
+        """
+        Sets a function returning the number of queued and dropped frames of each client, keyed by local name.
+        """
+        self.queue_sizes = fn
+
+    def set_fn_replica_loads(self, fn):
+        """
+        Sets a function returning the number of outstanding requests of each replica of the worker groups,
+        keyed by local name and connection id.
+        """
+        self.replica_loads = fn
+
+    def received(self, name: str, kind: int, size: int):
+        self.messages_in[name, kind] += 1
+        self.bytes_in[name, kind] += size
+
+    def sent(self, name: str, kind: int, size: int):
+        self.messages_out[name, kind] += 1
+        self.bytes_out[name, kind] += size
+
+    def error(self, reason: str):
+        self.errors[reason] += 1
+
+    def compressed(self, algorithm: str, source: str, raw: int, size: int):
+        self.compression_raw[algorithm, source] += raw
+        self.compression_compressed[algorithm, source] += size
+
+    def compression_time(self, algorithm: str, operation: str, seconds: float):
+        self.compression_seconds[algorithm, operation] += seconds
+
+    def request_forwarded(self, uuid: Optional[str], route: Optional[str]):
+        # Each chunk of a chunked request is forwarded, the request is timed from its first chunk
+        if uuid is None or uuid in self.__pending:
+            return
+        if len(self.__pending) >= self.max_pending:
+            del self.__pending[next(iter(self.__pending))]
+        self.__pending[uuid] = (route, time.perf_counter())
+
+    def replica_request(self, name: str, connection_id: int):
+        self.replica_requests[name, connection_id] += 1
+
+    def request_coalesced(self, route: Optional[str]):
+        self.coalesced[route] += 1
+
+    def request_replayed(self, route: Optional[str]):
+        self.replayed[route] += 1
+
+    def request_answered(self, uuid: Optional[str]):
+        started = self.__pending.pop(uuid, None)
+        if started is not None:
+            route, start = started
+            self.latency[route].observe(time.perf_counter() - start)
+
+    @property
+    def pending(self) -> int:
+        """
+        :class:`int`: Returns the number of requests waiting for a response.
+        """
+        return len(self.__pending)
+
+    def render(self) -> str:
+        """
+        Returns a snapshot of the metrics in the Prometheus text exposition format.
+        """
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append("# HELP winerp_%s %s" % (name, help_text))
+            lines.append("# TYPE winerp_%s %s" % (name, kind))
+
+        for name, counter, help_text in (
+                ("messages_received_total", self.messages_in, "Messages received from the clients."),
+                ("bytes_received_total", self.bytes_in, "Bytes received from the clients."),
+                ("messages_sent_total", self.messages_out, "Messages sent to the clients."),
+                ("bytes_sent_total", self.bytes_out, "Bytes sent to the clients."),
+        ):
+            family(name, "counter", help_text)
+            for (client, kind), value in sorted(dict(counter).items(), key=str):
+                lines.append("winerp_%s%s %s" % (name, _labels(client=client, type=TYPE_NAMES.get(kind, kind)), value))
+
+        family("errors_total", "counter", "Errors sent back to the clients, by message.")
+        for reason, value in sorted(dict(self.errors).items()):
+            lines.append("winerp_errors_total%s %s" % (_labels(reason=reason), value))
+
+        for name, counter, help_text in (
+                ("compression_raw_bytes_total", self.compression_raw, "Size of the compressed bodies once decompressed."),
+                ("compression_compressed_bytes_total", self.compression_compressed, "Size of the compressed bodies."),
+        ):
+            family(name, "counter", help_text)
+            for (algorithm, source), value in sorted(dict(counter).items()):
+                lines.append("winerp_%s%s %s" % (name, _labels(algorithm=algorithm, source=source), value))
+        family("compression_seconds_total", "counter", "CPU time spent by the server compressing and decompressing bodies.")
+        for (algorithm, operation), value in sorted(dict(self.compression_seconds).items()):
+            lines.append("winerp_compression_seconds_total%s %s" % (_labels(algorithm=algorithm, operation=operation), value))
+
+        family("coalesced_requests_total", "counter", "Requests answered with the response of an identical request.")
+        for route, value in sorted(dict(self.coalesced).items(), key=str):
+            lines.append("winerp_coalesced_requests_total%s %s" % (_labels(route=route), value))
+        family("replayed_requests_total", "counter", "Requests sent again to another connection after their destination disconnected.")
+        for route, value in sorted(dict(self.replayed).items(), key=str):
+            lines.append("winerp_replayed_requests_total%s %s" % (_labels(route=route), value))
+
+        family("request_latency_seconds", "histogram", "Time between forwarding a request and forwarding its response.")
+        for route, histogram in sorted(dict(self.latency).items(), key=str):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), histogram.counts):
+                cumulative += count
+                lines.append("winerp_request_latency_seconds_bucket%s %s" % (_labels(route=route, le=bound), cumulative))
+            lines.append("winerp_request_latency_seconds_sum%s %s" % (_labels(route=route), histogram.sum))
+            lines.append("winerp_request_latency_seconds_count%s %s" % (_labels(route=route), histogram.count))
+
+        family("pending_requests", "gauge", "Requests forwarded and waiting for a response.")
+        lines.append("winerp_pending_requests %s" % self.pending)
+
+        queues = sorted(self.queue_sizes().items())
+        family("queued_frames", "gauge", "Frames waiting to be sent to a client.")
+        for client, (queued, _) in queues:
+            lines.append("winerp_queued_frames%s %s" % (_labels(client=client), queued))
+        family("dropped_frames_total", "counter", "Frames not queued because the queue of the client was full.")
+        for client, (_, dropped) in queues:
+            lines.append("winerp_dropped_frames_total%s %s" % (_labels(client=client), dropped))
+
+        family("replica_requests_total", "counter", "Requests forwarded to each replica of a worker group.")
+        for (client, replica), value in sorted(dict(self.replica_requests).items()):
+            lines.append("winerp_replica_requests_total%s %s" % (_labels(client=client, replica=replica), value))
+        family("replica_outstanding_requests", "gauge", "Requests forwarded to a replica and waiting for a response.")
+        for (client, replica), value in sorted(self.replica_loads().items()):
+            lines.append("winerp_replica_outstanding_requests%s %s" % (_labels(client=client, replica=replica), value))
+
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,68 @@
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Optional, Tuple
+
+# The close code of a client disconnected because its outbox overflowed ("Try Again Later"), the client reconnects
+OVERFLOW = 1013
+
+
+class Outbox:
+    """
+    A queue of frames waiting to be sent to a client, drained by the writer of the client.
+    The size limit is enforced by the :class:`~winerp.server.Server` for the frames it may drop,
+    replies are always queued.
+    The frames are pushed and evicted by the server while the writer pops them, possibly from another thread.
+
+    Parameters
+    -----------
+    limit: :class:`int`
+        The number of frames above which the outbox is full.
+    wake: Callable[[], None]
+        Wakes the writer up when a frame is pushed.
+    """
+
+    def __init__(self, limit: int, wake: Callable[[], None]):
+        self.limit = limit
+        self.frames: Deque[Tuple[Any, Optional[int]]] = deque()
+        self.dropped = 0
+        self.__wake = wake
+        self.__lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    @property
+    def full(self) -> bool:
+        """
+        :class:`bool`: Returns True if the outbox holds ``limit`` frames or more.
+        """
+        return len(self.frames) >= self.limit
+
+    def push(self, frame, kind: Optional[int] = None):
+        """
+        Queues a frame of type ``kind``, see :class:`~winerp.lib.payload.Payloads`.
+        """
+        with self.__lock:
+            self.frames.append((frame, kind))
+        self.__wake()
+
+    def pop(self):
+        """
+        Returns the oldest frame, None if the outbox is empty.
+        """
+        with self.__lock:
+            if not self.frames:
+                return None
+            return self.frames.popleft()[0]
+
+    def evict(self, kind: int) -> bool:
+        """
+        Drops the oldest frame of type ``kind``. Returns False if there is no such frame.
+        """
+        with self.__lock:
+            for index, (_, frame_kind) in enumerate(self.frames):
+                if frame_kind == kind:
+                    del self.frames[index]
+                    self.dropped += 1
+                    return True
+            return False
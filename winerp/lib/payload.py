@@ -15,6 +15,12 @@ class Payloads:
     ping = 5
     information = 6
     function_call = 7
+    stream = 8
+    batch = 9
+    invalidation = 10
+    subscription = 11
+    publication = 12
+    advertisement = 13
 
 class PayloadTypes:
     '''
@@ -25,6 +31,12 @@ class PayloadTypes:
         | ``response``: Response to a request.
         | ``error``: Error response.
         | ``ping``: Ping message.
+        | ``stream``: Flow control of a stream, sent by the requester to the route streaming the responses.
+        | ``batch``: Messages sent together by a client, unpacked by the server.
+        | ``invalidation``: Invalidation of the cached responses of a route, see :mod:`winerp.lib.cache`.
+        | ``subscription``: Subscriptions of a client to topics, see :mod:`winerp.lib.topics`.
+        | ``publication``: Data published to a topic.
+        | ``advertisement``: Routes provided by a client, see :mod:`winerp.lib.registry`.
     '''
     def __init__(self, type: int) -> None:
         self._type = type
@@ -88,6 +100,48 @@ class PayloadTypes:
         '''
         return self._type == Payloads.function_call
 
+    @property
+    def stream(self) -> bool:
+        '''
+        :class:`bool`: Returns ``True`` if the message is a stream flow control message.
+        '''
+        return self._type == Payloads.stream
+
+    @property
+    def batch(self) -> bool:
+        '''
+        :class:`bool`: Returns ``True`` if the message is a batch of messages.
+        '''
+        return self._type == Payloads.batch
+
+    @property
+    def invalidation(self) -> bool:
+        '''
+        :class:`bool`: Returns ``True`` if the message invalidates cached responses.
+        '''
+        return self._type == Payloads.invalidation
+
+    @property
+    def subscription(self) -> bool:
+        '''
+        :class:`bool`: Returns ``True`` if the message changes the subscriptions of a client.
+        '''
+        return self._type == Payloads.subscription
+
+    @property
+    def publication(self) -> bool:
+        '''
+        :class:`bool`: Returns ``True`` if the message is published to a topic.
+        '''
+        return self._type == Payloads.publication
+
+    @property
+    def advertisement(self) -> bool:
+        '''
+        :class:`bool`: Returns ``True`` if the message advertises the routes of a client.
+        '''
+        return self._type == Payloads.advertisement
+
 
 
 class MessagePayload:
@@ -0,0 +1,70 @@
+"""
+The routes provided by the clients, kept by the :class:`~winerp.server.Server` to resolve the requests
+sent without a source.
+
+A client advertises its routes in the data of its verification, and again with an
+:attr:`~winerp.lib.payload.Payloads.advertisement` message whenever they change::
+
+    {"data":{"routes":["get_config","members"],"coalesce":["get_config"]}}
+
+The advertised routes replace the previous ones.
+The workers of a server and the servers of a mesh announce the routes of their clients to each other,
+see :class:`~winerp.lib.cluster.Cluster`, so a request can be resolved to a client of another server.
+"""
+from typing import Dict, Iterable, List, Set
+
+
+class RouteRegistry:
+    """
+    An index of the providers of each route, in the order they advertised it.
+    """
+
+    def __init__(self):
+        # route -> local names of its providers, a dict keeps them ordered
+        self.__providers: Dict[str, Dict[str, None]] = {}
+        # local name -> routes it provides
+        self.__routes: Dict[str, Set[str]] = {}
+
+    def __contains__(self, route: str) -> bool:
+        return route in self.__providers
+
+    def register(self, name: str, routes: Iterable[str]):
+        """
+        Sets the routes provided by ``name``.
+        """
+        old = self.__routes.get(name, set())
+        new = set(routes)
+        for route in old - new:
+            self.__remove(route, name)
+        for route in new - old:
+            self.__providers.setdefault(route, {})[name] = None
+        if new:
+            self.__routes[name] = new
+        else:
+            self.__routes.pop(name, None)
+
+    def unregister(self, name: str):
+        """
+        Removes every route provided by ``name``.
+        """
+        for route in self.__routes.pop(name, ()):
+            self.__remove(route, name)
+
+    def __remove(self, route, name):
+        providers = self.__providers.get(route)
+        if providers is not None:
+            providers.pop(name, None)
+            if not providers:
+                del self.__providers[route]
+
+    def providers(self, route: str) -> List[str]:
+        """
+        Returns the local names of the providers of ``route``.
+        """
+        return list(self.__providers.get(route, ()))
+
+    def routes(self, name: str) -> Set[str]:
+        """
+        Returns the routes provided by ``name``.
+        """
+        return set(self.__routes.get(name, ()))
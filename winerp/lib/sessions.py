@@ -0,0 +1,148 @@
+"""
+The sessions of the clients which lost their connection, kept by the :class:`~winerp.server.Server` so a client
+reconnecting shortly after resumes where it left.
+
+The server sends a resume token to a client with every :attr:`~winerp.lib.payload.Payloads.success` message::
+
+    {"type":0,...,"resume":"J3q..."}
+
+When the active connection of a local name is lost and no other connection takes its place, the server holds
+its session for a while: its subscriptions are kept and the responses sent to it are buffered.
+The client sends its last token in the data of its verification when it reconnects::
+
+    {"codec":"json",...,"resume":"J3q..."}
+
+If the token matches a held session, the client is subscribed again and sent the buffered responses,
+and the success message holds ``"resumed":true``. Otherwise, the session is dropped.
+If the token matches the connection still active for the name, which the server has not noticed is lost yet,
+that connection is closed with the close code :data:`REPLACED` and the new one takes its place.
+A client whose connection is closed with this code does not reconnect.
+"""
+import secrets
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# The close code of a connection replaced by a newer connection of the same client, "Policy Violation"
+# as the threaded engine only sends the codes defined by RFC 6455
+REPLACED = 1008
+
+
+class Session:
+    __slots__ = ("name", "token", "subscriptions", "responses", "size", "expiry")
+
+    def __init__(self, name: str, token: str, subscriptions: Set[str], expiry: float):
+        self.name = name
+        self.token = token
+        self.subscriptions = subscriptions
+        # (header, raw body) of the responses sent to the client while it was disconnected
+        self.responses: List[Tuple[Dict[str, Any], Any]] = []
+        # the number of bytes of the buffered bodies
+        self.size = 0
+        self.expiry = expiry
+
+
+class SessionStore:
+    """
+    The resume tokens of the connections and the sessions held for the lost ones.
+
+    Parameters
+    -----------
+    timeout: :class:`float`
+        The time in seconds a session is held after its connection is lost.
+    max_responses: :class:`int`
+        The number of responses buffered for a session. The later responses are dropped. Defaults to 1024.
+    max_bytes: :class:`int`
+        The number of bytes of the response bodies buffered for a session.
+        The later responses which do not fit are dropped. Defaults to 16 MiB.
+    """
+
+    def __init__(self, timeout: float, max_responses: int = 1024, max_bytes: int = 16777216):
+        self.timeout = timeout
+        self.max_responses = max_responses
+        self.max_bytes = max_bytes
+        # connection id -> (local name, token) of the authorized connections
+        self.__tokens: Dict[int, Tuple[str, str]] = {}
+        # local name -> session held for it
+        self.__sessions: Dict[str, Session] = {}
+
+    def __len__(self) -> int:
+        return len(self.__sessions)
+
+    def issue(self, connection_id: int, name: str) -> str:
+        """
+        Returns a new resume token for an authorized connection.
+        """
+        token = secrets.token_urlsafe(16)
+        self.__tokens[connection_id] = (name, token)
+        return token
+
+    def token(self, connection_id: int) -> Optional[str]:
+        """
+        Returns the resume token of a connection, None if it was not issued any.
+        """
+        return self.__tokens.get(connection_id, (None, None))[1]
+
+    def owns(self, connection_id: int, token: Optional[str]) -> bool:
+        """
+        Returns True if ``token`` is the resume token of a connection.
+        """
+        issued = self.token(connection_id)
+        return issued is not None and isinstance(token, str) and secrets.compare_digest(issued, token)
+
+    def forget(self, connection_id: int):
+        """
+        Drops the resume token of a lost connection without holding its session.
+        """
+        self.__tokens.pop(connection_id, None)
+
+    def hold(self, connection_id: int, subscriptions: Set[str]):
+        """
+        Holds the session of a lost connection, with the topic patterns it subscribed to.
+        Nothing is held if :attr:`timeout` is None or 0.
+        """
+        entry = self.__tokens.pop(connection_id, None)
+        if entry is None or not self.timeout:
+            return
+        now = time.monotonic()
+        # The sessions are kept in the order they expire, the expired ones are the first ones
+        expired = []
+        for name, session in self.__sessions.items():
+            if session.expiry > now:
+                break
+            expired.append(name)
+        for name in expired:
+            del self.__sessions[name]
+        name, token = entry
+        self.__sessions.pop(name, None)
+        self.__sessions[name] = Session(name, token, subscriptions, now + self.timeout)
+
+    def buffer(self, name: str, header: Dict[str, Any], body: Any) -> bool:
+        """
+        Buffers a response sent to ``name``, returns False if no session is held for it.
+        """
+        session = self.__get(name)
+        if session is None:
+            return False
+        size = 0 if body is None else len(body)
+        if len(session.responses) < self.max_responses and session.size + size <= self.max_bytes:
+            session.responses.append((header, body))
+            session.size += size
+        return True
+
+    def resume(self, name: str, token: Optional[str]) -> Optional[Session]:
+        """
+        Returns the session held for ``name`` if ``token`` is its token, None otherwise.
+        The session is no longer held either way.
+        """
+        session = self.__get(name)
+        self.__sessions.pop(name, None)
+        if session is None or not isinstance(token, str) or not secrets.compare_digest(session.token, token):
+            return None
+        return session
+
+    def __get(self, name):
+        session = self.__sessions.get(name)
+        if session is not None and session.expiry <= time.monotonic():
+            del self.__sessions[name]
+            return None
+        return session
@@ -0,0 +1,157 @@
+"""
+Shared memory side channel for clients running on the same host.
+
+Bodies larger than a threshold are written once into a shared memory segment, encoded with the codec of
+the sender, and only a small handle goes through the server::
+
+    {"shared_memory":{"name":"psm_1a2b3c","size":1048576,"unlink":true,"codec":"msgpack"}}
+
+``codec`` is left out for JSON bodies. The smaller bodies are sent as usual.
+
+Lifetime of a segment:
+    | The receiver of a request, a response or an error maps the segment, decodes the body and unlinks it.
+    | Information messages may have many receivers, which never unlink the segment.
+      Neither do the receivers of a coalesced response, the server sends them a handle rewritten by :func:`keep`.
+    | The sender unlinks every segment it created after ``ttl`` seconds if it is still there,
+      so a segment which is never picked up does not outlive it for long.
+    | The segments still held by the sender are unlinked when its interpreter exits.
+
+The segments are not registered to the ``multiprocessing`` resource tracker, as it would unlink them
+as soon as the process which mapped them exits.
+"""
+import asyncio
+import atexit
+import sys
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, Union
+
+import orjson
+
+from .binary import MSGPACK, Packed, pack_body, unpack_body
+from .payload import Payloads
+
+try:
+    from _posixshmem import shm_unlink
+except ImportError:
+    # Windows frees a segment once every handle to it is closed
+    shm_unlink = None
+
+HANDLE_KEY = "shared_memory"
+
+# The handle is the only field of the body of a message sent through shared memory, encoded by either codec
+_PREFIXES = (b'{"shared_memory":', b"\x81\xadshared_memory")
+
+
+def _open(name: str = None, size: int = 0) -> SharedMemory:
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name=name, create=name is None, size=size, track=False)
+    segment = SharedMemory(name=name, create=name is None, size=size)
+    if shm_unlink is not None:
+        resource_tracker.unregister(segment._name, "shared_memory")
+    return segment
+
+
+def _unlink(segment: SharedMemory):
+    if shm_unlink is not None:
+        try:
+            shm_unlink(segment._name)
+        except FileNotFoundError:
+            pass
+
+
+class SharedMemoryChannel:
+    """
+    Moves the large bodies sent by a client to shared memory segments.
+
+    Parameters
+    -----------
+    threshold: :class:`int`
+        The size in bytes above which a body is moved to a shared memory segment.
+    ttl: :class:`float`
+        The time in seconds after which the sender unlinks a segment.
+    """
+
+    def __init__(self, threshold: int, ttl: float = 30):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.__segments: Dict[str, SharedMemory] = {}
+        atexit.register(self.close)
+
+    def share(self, header: Dict[str, Any], body: Union[bytes, Packed]) -> Union[bytes, Packed]:
+        """
+        Writes the encoded body of a message to a segment.
+        Returns the body holding the handle of the segment, encoded with the same codec.
+        """
+        unlink = header.get("type") != Payloads.information
+        if isinstance(body, Packed):
+            handle = self.__share(body.buffer, unlink)
+            handle["codec"] = MSGPACK
+            return pack_body({HANDLE_KEY: handle})
+        return orjson.dumps({HANDLE_KEY: self.__share(body, unlink)})
+
+    def __share(self, body: bytes, unlink: bool) -> dict:
+        segment = _open(size=len(body))
+        segment.buf[:len(body)] = body
+        self.__segments[segment.name] = segment
+        asyncio.get_running_loop().call_later(self.ttl, self.__expire, segment.name)
+        return {"name": segment.name, "size": len(body), "unlink": unlink}
+
+    def __expire(self, name: str):
+        segment = self.__segments.pop(name, None)
+        if segment is not None:
+            _unlink(segment)
+            segment.close()
+
+    def close(self):
+        """
+        Unlinks every segment which has not expired yet.
+        """
+        for name in list(self.__segments):
+            self.__expire(name)
+
+
+def is_handle(body: Union[bytes, str, Packed]) -> bool:
+    """
+    Returns True if the raw body of a frame holds the handle of a segment, without decoding it.
+    """
+    raw = body.buffer if isinstance(body, Packed) else body
+    if isinstance(raw, str):
+        return raw.startswith(_PREFIXES[0].decode("ascii"))
+    return bytes(raw[:15]).startswith(_PREFIXES)
+
+
+def keep(body: Union[bytes, str, Packed]) -> Union[bytes, Packed]:
+    """
+    Returns the body of a handle whose receivers do not unlink the segment, encoded with the same codec,
+    so it can be sent to many receivers. The segment is unlinked by its sender after its ``ttl``.
+    """
+    if isinstance(body, Packed):
+        handle = unpack_body(body)[HANDLE_KEY]
+        handle["unlink"] = False
+        return pack_body({HANDLE_KEY: handle})
+    handle = orjson.loads(body)[HANDLE_KEY]
+    handle["unlink"] = False
+    return orjson.dumps({HANDLE_KEY: handle})
+
+
+def load(handle: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Maps the segment of a handle and decodes the body it holds.
+
+    Raises
+    -------
+        FileNotFoundError
+            The segment has expired or was created on another host.
+    """
+    segment = _open(name=handle["name"])
+    buffer = segment.buf[:handle["size"]]
+    try:
+        if handle.get("codec") == MSGPACK:
+            return unpack_body(Packed(buffer))
+        return orjson.loads(buffer)
+    finally:
+        buffer.release()
+        if handle["unlink"]:
+            _unlink(segment)
+        segment.close()
@@ -0,0 +1,72 @@
+"""
+Streaming of the items yielded by the async generator routes.
+
+A stream is requested with a request holding the window and the timeout of the requester in its body::
+
+    {"data":{...},"stream":{"window":16,"timeout":60}}
+
+The route sends every item it yields as a response with the same uuid, then a last response ending the stream::
+
+    {"data":<item>,"stream":{"seq":0}}
+    {"data":null,"stream":{"seq":12,"end":true}}
+
+The route may only send as many items as it was granted credits. It starts with ``window`` credits,
+and the requester grants new ones with :attr:`~winerp.lib.payload.Payloads.stream` messages
+once it has consumed the items, so a slow consumer pauses the route::
+
+    {"data":null,"stream":{"credits":8}}
+    {"data":null,"stream":{"cancel":true}}
+
+A route waiting for credits longer than the timeout of the requester stops, as the requester
+has given up on the stream or lost its connection.
+"""
+import asyncio
+
+STREAM_KEY = "stream"
+
+
+class Credits:
+    """
+    The credits granted to a route streaming its items.
+
+    Parameters
+    -----------
+    window: :class:`int`
+        The number of credits granted by the requester when the stream starts.
+    """
+
+    def __init__(self, window: int):
+        self.available = window
+        self.cancelled = False
+        self.__event = asyncio.Event()
+
+    def grant(self, count: int):
+        """
+        Grants ``count`` more credits.
+        """
+        self.available += count
+        self.__event.set()
+
+    def cancel(self):
+        """
+        Stops the stream, the requester no longer consumes it.
+        """
+        self.cancelled = True
+        self.__event.set()
+
+    async def acquire(self, timeout: float = None) -> bool:
+        """|coro|
+
+        Waits for a credit and takes it. Returns False if the stream is cancelled,
+        or if no credit is granted within ``timeout`` seconds, which cancels it.
+        """
+        while self.available <= 0 and not self.cancelled:
+            self.__event.clear()
+            try:
+                await asyncio.wait_for(self.__event.wait(), timeout)
+            except asyncio.TimeoutError:
+                self.cancel()
+        if self.cancelled:
+            return False
+        self.available -= 1
+        return True
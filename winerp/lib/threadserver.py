@@ -0,0 +1,112 @@
+def noop(*args, **kwargs):
+    pass
+
+import logging
+original_basicConfig = logging.basicConfig
+logging.basicConfig = noop
+
+from websocket_server import WebsocketServer
+logging.basicConfig = original_basicConfig
+
+import threading
+
+from .outbox import Outbox
+
+
+class ThreadedWebsocketServer(WebsocketServer):
+    """
+    A ``websocket_server.WebsocketServer`` sending the messages of each client from a writer thread
+    draining the :class:`~winerp.lib.outbox.Outbox` of the client, so a slow client only blocks its own writer.
+    Each client is read by its own thread, the callbacks are run one at a time so they can share state.
+
+    Parameters
+    -----------
+    host: Optional[:class:`str`]
+        The host to bind to. Defaults to 127.0.0.1.
+    port: Optional[:class:`int`]
+        The port to bind to. Defaults to 0.
+    queue_size: Optional[:class:`int`]
+        The size of the outbox of each client. Defaults to 1024.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, queue_size: int = 1024):
+        super().__init__(host=host, port=port)
+        self.queue_size = queue_size
+        self.__new_client = noop
+        self.__client_left = noop
+        self.__message_received = noop
+        # Reentrant, a callback disconnecting a client runs the callback of the client leaving
+        self.__lock = threading.RLock()
+        super().set_fn_new_client(self.__on_new_client)
+        super().set_fn_client_left(self.__on_client_left)
+        super().set_fn_message_received(self.__on_message_received)
+
+    def set_fn_new_client(self, fn):
+        self.__new_client = fn
+
+    def set_fn_client_left(self, fn):
+        self.__client_left = fn
+
+    def set_fn_message_received(self, fn):
+        self.__message_received = fn
+
+    def __on_message_received(self, client, server, message):
+        with self.__lock:
+            self.__message_received(client, server, message)
+
+    def __on_new_client(self, client, server):
+        condition = threading.Condition()
+
+        def wake():
+            with condition:
+                condition.notify()
+
+        client["outbox"] = Outbox(self.queue_size, wake)
+        client["condition"] = condition
+        client["connected"] = True
+        threading.Thread(target=self.__writer, args=(client,), daemon=True).start()
+        with self.__lock:
+            self.__new_client(client, server)
+
+    def __on_client_left(self, client, server):
+        # A client closed by disconnect() leaves once when it is closed and once when its handler ends
+        if client is None:
+            return
+        client["connected"] = False
+        with client["condition"]:
+            client["condition"].notify()
+        with self.__lock:
+            self.__client_left(client, server)
+
+    def __writer(self, client):
+        outbox = client["outbox"]
+        condition = client["condition"]
+        while True:
+            with condition:
+                while not outbox.frames and client["connected"]:
+                    condition.wait()
+            if not client["connected"]:
+                return
+            try:
+                frame = outbox.pop()
+                while frame is not None:
+                    client["handler"].send_message(frame)
+                    frame = outbox.pop()
+            except OSError:
+                return
+
+    def send_message(self, client, msg):
+        """
+        Queues ``msg`` to be sent to ``client``.
+        """
+        client["outbox"].push(msg)
+
+    def disconnect(self, client, code: int = 1000, reason: str = ""):
+        """
+        Closes the connection of ``client`` with the close ``code`` and ``reason``.
+        """
+        try:
+            client["handler"].send_close(code, reason.encode())
+        except OSError:
+            pass
+        self._terminate_client_handler(client["handler"])
@@ -0,0 +1,125 @@
+"""
+The subscriptions of the clients to the topics of the publications, kept by the :class:`~winerp.server.Server`.
+
+A topic is a list of segments separated by dots, like ``guild.123.member_join``.
+A client subscribes to a topic or to a pattern, in which ``*`` matches a single segment
+and a trailing ``#`` matches any number of segments, none included::
+
+    guild.123.member_join
+    guild.*.member_join
+    guild.123.#
+
+A client subscribes and unsubscribes with a :attr:`~winerp.lib.payload.Payloads.subscription` message::
+
+    {"data":{"subscribe":["guild.*.member_join"],"unsubscribe":[]}}
+"""
+from typing import Dict, Iterable, Set
+
+SEPARATOR = "."
+ONE = "*"
+REST = "#"
+
+
+def validate(pattern: str, wildcards: bool = True):
+    """
+    Raises :class:`ValueError` if ``pattern`` is not a valid topic pattern,
+    or not a valid topic if ``wildcards`` is False.
+    """
+    if not isinstance(pattern, str) or not pattern:
+        raise ValueError("Topic should be a non empty string")
+    segments = pattern.split(SEPARATOR)
+    if not wildcards and (ONE in segments or REST in segments):
+        raise ValueError("A published topic can't hold wildcards")
+    if REST in segments[:-1]:
+        raise ValueError("'#' can only be the last segment of a topic")
+
+
+class _Node:
+    __slots__ = ("children", "subscribers")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.subscribers: Set[str] = set()
+
+
+class TopicIndex:
+    """
+    A tree of the topic patterns, each segment of a pattern being a level of the tree.
+    Matching a topic walks the branches of its segments and of the wildcards, so its cost depends on
+    the number of segments and of matching patterns, not on the number of clients.
+    """
+
+    def __init__(self):
+        self.__root = _Node()
+        # local name -> patterns it subscribed to
+        self.__patterns: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(patterns) for patterns in self.__patterns.values())
+
+    def subscriptions(self, name: str) -> Set[str]:
+        """
+        Returns the patterns ``name`` subscribed to.
+        """
+        return set(self.__patterns.get(name, ()))
+
+    def subscribe(self, pattern: str, name: str):
+        node = self.__root
+        for segment in pattern.split(SEPARATOR):
+            node = node.children.setdefault(segment, _Node())
+        node.subscribers.add(name)
+        self.__patterns.setdefault(name, set()).add(pattern)
+
+    def unsubscribe(self, pattern: str, name: str):
+        path = [self.__root]
+        for segment in pattern.split(SEPARATOR):
+            node = path[-1].children.get(segment)
+            if node is None:
+                return
+            path.append(node)
+        path[-1].subscribers.discard(name)
+        patterns = self.__patterns.get(name)
+        if patterns is not None:
+            patterns.discard(pattern)
+            if not patterns:
+                del self.__patterns[name]
+        # The branches left without subscribers are pruned
+        for segment, parent, node in zip(reversed(pattern.split(SEPARATOR)), reversed(path[:-1]), reversed(path[1:])):
+            if node.subscribers or node.children:
+                break
+            del parent.children[segment]
+
+    def unsubscribe_all(self, name: str, patterns: Iterable[str] = None):
+        """
+        Removes the subscriptions of ``name`` to ``patterns``, or to every pattern if None.
+        """
+        for pattern in list(patterns if patterns is not None else self.__patterns.get(name, ())):
+            self.unsubscribe(pattern, name)
+
+    def match(self, topic: str) -> Set[str]:
+        """
+        Returns the local names of the subscribers of ``topic``.
+        """
+        segments = topic.split(SEPARATOR)
+        names = set()
+        nodes = [self.__root]
+        for segment in segments:
+            following = []
+            for node in nodes:
+                rest = node.children.get(REST)
+                if rest is not None:
+                    names |= rest.subscribers
+                for key in (segment, ONE) if segment != ONE else (ONE,):
+                    child = node.children.get(key)
+                    if child is not None:
+                        following.append(child)
+            if not following:
+                return names
+            nodes = following
+        for node in nodes:
+            names |= node.subscribers
+            # A trailing '#' also matches no segment
+            rest = node.children.get(REST)
+            if rest is not None:
+                names |= rest.subscribers
+        return names
@@ -1,16 +1,29 @@
-def noop(*args, **kwargs):
-    pass
-    
 import logging
-original_basicConfig = logging.basicConfig
-logging.basicConfig = noop
-
-from websocket_server import WebsocketServer
-logging.basicConfig = original_basicConfig
+import multiprocessing
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
 
 import orjson
+from .lib import binary, chunks, coalescing, compression, envelope, groups, shm
+from .lib.errors import EncodingError
+from .lib.failover import OutstandingRequests
+from .lib.outbox import OVERFLOW
+from .lib.sessions import REPLACED, SessionStore
+from .lib.aioserver import AsyncWebsocketServer
+from .lib.cluster import Cluster, MeshCluster, WorkerCluster
 from .lib.message import WsMessage
+from .lib.metrics import Metrics
 from .lib.payload import Payloads, MessagePayload
+from .lib.registry import RouteRegistry
+from .lib.threadserver import ThreadedWebsocketServer
+from .lib.topics import TopicIndex, validate as validate_topic
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -26,6 +39,12 @@ class Server:
     All requests and responses pass through the server
 
     If the library is installed using PyPi, you can also use terminal to start server using `winerp --port 1234`
+
+    Clients can ask for the binary ``msgpack`` codec, see :class:`~winerp.client.Client`.
+    The server accepts it if it runs the ``asyncio`` engine and ``msgpack`` is installed,
+    and re-encodes the frames exchanged between clients using different codecs.
+    The compression of the large bodies is negotiated the same way, compressed bodies are forwarded as-is
+    to the clients using the same codec and algorithm, and decompressed for the others.
     
     Parameters
     -----------
@@ -33,20 +52,165 @@ class Server:
         The host on which the server is running. Defaults to 127.0.0.1.
     port: Optional[:class:`int`]
         The port on which the server is running. Defaults to 13254.
+    engine: Optional[:class:`str`]
+        The engine used to serve the connections. Either ``threaded`` (default), which runs
+        one thread per connected client, or ``asyncio``, which serves all the clients from a single event loop.
+        The ``asyncio`` engine is recommended for a large number of clients.
+    uvloop: Optional[:class:`bool`]
+        If set to True, the ``asyncio`` engine runs on ``uvloop``. Defaults to False.
+    workers: Optional[:class:`int`]
+        The number of worker processes serving the port. Defaults to 1.
+        With more than one worker, every worker binds the port with ``SO_REUSEPORT`` (Linux only)
+        and the workers forward frames to each other over unix sockets,
+        so clients connected to different workers can still reach each other.
+        Requires the ``asyncio`` engine.
+    mesh_port: Optional[:class:`int`]
+        The port on which the server accepts links from the other servers of a mesh.
+        Defaults to None, the server does not accept links.
+    peers: Optional[List[:class:`str`]]
+        The addresses (``host:port``) of the other servers of the mesh. A link is used in both directions,
+        so every pair of servers must be linked by at least one of them.
+        Clients connected to the servers of a mesh can reach each other, a request between two clients
+        of the same server stays on that server. Requires the ``asyncio`` engine and a single worker.
+    socket_path: Optional[:class:`str`]
+        The path of a unix socket the server listens on, in addition to the port.
+        Clients on the same host can connect to it to skip the TCP stack.
+        Requires the ``asyncio`` engine and a single worker. The server fails to start
+        if another server listens on this path.
+    queue_size: Optional[:class:`int`]
+        The number of frames which can be queued for a client before its outbound queue is full.
+        Each client is sent its frames by its own writer, so a slow client does not block the others.
+        Defaults to 1024.
+    overflow: Optional[:class:`str`]
+        What happens to a request or an information message for a client whose queue is full.
+        Replies are always queued.
+
+        | ``reject`` (default): requests are rejected with an error sent back to the requester, informs are dropped.
+        | ``drop``: the oldest queued information message is dropped to make room, if there is none it is like ``reject``.
+        | ``disconnect``: the slow client is disconnected with the close code 1013 and reconnects.
+    metrics_interval: Optional[:class:`float`]
+        If set, a snapshot of the :class:`~winerp.lib.metrics.Metrics` of the server, kept in :attr:`metrics`,
+        is dumped every ``metrics_interval`` seconds. Defaults to None.
+    metrics_path: Optional[:class:`str`]
+        The file the snapshots of :attr:`metrics` are written to, e.g. for the textfile collector of the
+        Prometheus node exporter. The file is replaced atomically. Each worker writes to its own file,
+        suffixed with its name. Defaults to None, the snapshots are printed to stdout.
+    balancing: Optional[:class:`str`]
+        How the requests to a worker group, the clients connected with the same local name and the ``group`` flag,
+        are spread across its replicas, see :mod:`winerp.lib.groups`.
+
+        | ``round_robin`` (default): each replica in turn.
+        | ``least_outstanding``: the replica with the fewest requests waiting for a response.
+    resume_timeout: Optional[:class:`float`]
+        The time in seconds the session of a lost client is held, so the client can resume it when it reconnects,
+        see :mod:`winerp.lib.sessions`. With several workers, a client resumes its session only if it reconnects
+        to the same worker. Defaults to 30, None disables it.
     """
 
     def __init__(
             self,
             host: str = "127.0.0.1",
-            port: int = 13254
+            port: int = 13254,
+            engine: str = "threaded",
+            uvloop: bool = False,
+            workers: int = 1,
+            mesh_port: Optional[int] = None,
+            peers: Optional[List[str]] = None,
+            socket_path: Optional[str] = None,
+            queue_size: int = 1024,
+            overflow: str = "reject",
+            metrics_interval: Optional[float] = None,
+            metrics_path: Optional[str] = None,
+            balancing: str = groups.ROUND_ROBIN,
+            resume_timeout: Optional[float] = 30
     ):
-        self.websocket = WebsocketServer(host=host, port=port)
+        if engine == "threaded":
+            if uvloop:
+                raise ValueError("uvloop can only be used with the asyncio engine")
+            self.websocket = ThreadedWebsocketServer(host=host, port=port, queue_size=queue_size)
+        elif engine == "asyncio":
+            self.websocket = AsyncWebsocketServer(
+                host=host,
+                port=port,
+                use_uvloop=uvloop,
+                unix_path=socket_path,
+                queue_size=queue_size
+            )
+        else:
+            raise ValueError("engine should be either 'threaded' or 'asyncio'")
+        if workers > 1 and engine != "asyncio":
+            raise ValueError("multiple workers can only be used with the asyncio engine")
+        if (mesh_port is not None or peers) and (engine != "asyncio" or workers > 1):
+            raise ValueError("a mesh can only be used with the asyncio engine and a single worker")
+        if socket_path is not None and (engine != "asyncio" or workers > 1):
+            raise ValueError("a unix socket can only be used with the asyncio engine and a single worker")
+        if overflow not in ("reject", "drop", "disconnect"):
+            raise ValueError("overflow should be either 'reject', 'drop' or 'disconnect'")
+        if balancing not in groups.STRATEGIES:
+            raise ValueError("balancing should be either 'round_robin' or 'least_outstanding'")
+        self.engine = engine
+        self.workers = workers
+        self.overflow = overflow
+        self.balancing = balancing
+        self.metrics_interval = metrics_interval
+        self.metrics_path = metrics_path
+        self.metrics = Metrics()
+        # The threaded engine can't receive binary frames, compressed bodies are sent in binary frames
+        if engine == "asyncio" and binary.msgpack is not None:
+            self.codecs = binary.CODECS
+            self.compressions = compression.available()
+        else:
+            self.codecs = (binary.JSON,)
+            self.compressions = ()
+        self.__options = {
+            "host": host,
+            "port": port,
+            "engine": engine,
+            "uvloop": uvloop,
+            "queue_size": queue_size,
+            "overflow": overflow,
+            "metrics_interval": metrics_interval,
+            "metrics_path": metrics_path,
+            "balancing": balancing,
+            "resume_timeout": resume_timeout
+        }
+        self.cluster = None
         self.websocket.set_fn_new_client(self.__on_client_connect)
         self.websocket.set_fn_message_received(self.__on_message)
         self.websocket.set_fn_client_left(self.__on_client_disconnect)
         self.active_clients = {}
         self.pending_verification = {}
         self.on_hold_connections = {}
+        # connection id -> local name, for both active and on hold connections
+        self.__connection_names = {}
+        # connection id -> codec of the clients sending enveloped frames, see winerp.lib.envelope and winerp.lib.binary
+        self.__codecs = {}
+        # connection id -> (algorithm, threshold) of the clients accepting compressed bodies
+        self.__compressions = {}
+        # connection ids of the clients taking part in chunked transfers, the others are sent the joined chunks
+        self.__chunked = set()
+        self.assembler = chunks.Assembler()
+        # connection id -> routes whose identical requests are coalesced, see winerp.lib.coalescing
+        self.__coalescible = {}
+        self.coalescer = coalescing.Coalescer()
+        # connection id -> routes whose requests are sent again to another connection if it is lost
+        self.__idempotent = {}
+        self.outstanding = OutstandingRequests()
+        self.sessions = SessionStore(resume_timeout)
+        # connection id -> routes advertised by the client, only the active clients are in the registry
+        self.__advertised = {}
+        self.registry = RouteRegistry()
+        # connection ids of the clients which asked to join a worker group
+        self.__grouped = set()
+        # connection id -> (member identity, shards) of the clients which asked to join a worker group
+        self.__members = {}
+        # local name -> replicas, for the names with several active connections
+        self.groups: Dict[str, groups.ReplicaGroup] = {}
+        self.topics = TopicIndex()
+        self.metrics.set_fn_queue_sizes(self.__queue_sizes)
+        self.metrics.set_fn_replica_loads(self.__replica_loads)
+        if mesh_port is not None or peers:
+            self.__attach(MeshCluster(host, mesh_port, peers or [], name="%s:%s" % (socket.gethostname(), port)))
 
     @property
     def client_count(self) -> int:
@@ -55,73 +219,510 @@ class Server:
         """
         return len(self.active_clients)
 
+    @property
+    def queue_depths(self) -> Dict[str, int]:
+        """
+        Dict[:class:`str`, :class:`int`]: Returns the number of frames queued for each connected client.
+        """
+        return {cid: len(client_obj["client"]["outbox"]) for cid, client_obj in self.active_clients.items()}
+
+    def __queue_sizes(self):
+        # The clients are copied first, the snapshot may be taken from another thread
+        return {
+            cid: (len(client_obj["client"]["outbox"]), client_obj["client"]["outbox"].dropped)
+            for cid, client_obj in list(self.active_clients.items())
+        }
+
+    def __replica_loads(self):
+        return {
+            (name, replica["id"]): group.outstanding.get(replica["id"], 0)
+            for name, group in list(self.groups.items())
+            for replica in list(group.replicas)
+        }
+
     def __on_client_connect(self, client, _):
-        logger.info("Client connected with id %s" % client['address'][1])
-        self.pending_verification[client["address"][1]] = client
+        logger.info("Client connected with id %s" % client['id'])
+        self.pending_verification[client["id"]] = client
 
     def __on_client_disconnect(self, client, _):
-        logger.info("Client disconnected with id %s" % client['address'][1])
-        for cid, each_client in self.active_clients.items():
-            if each_client["id"] == client["address"][1]:
-                del self.active_clients[cid]
-                if cid in self.on_hold_connections:
-                    logger.info("On Hold Client moved to active client with connection id %s and local id %s" % (self.on_hold_connections[cid]['id'], cid))
-                    self.active_clients[cid] = self.on_hold_connections[cid]
-                    self.__send_message(
-                        self.on_hold_connections[cid]["client"],
-                        MessagePayload(type=Payloads.success, data="Authorized.")
-                    )
-                    del self.pending_verification[self.on_hold_connections[cid]["id"]]
-                    del self.on_hold_connections[cid]
+        connection_id = client["id"]
+        logger.info("Client disconnected with id %s" % connection_id)
+        self.pending_verification.pop(connection_id, None)
+        self.__codecs.pop(connection_id, None)
+        self.__compressions.pop(connection_id, None)
+        self.__chunked.discard(connection_id)
+        self.assembler.drop(connection_id)
+        self.__coalescible.pop(connection_id, None)
+        self.__idempotent.pop(connection_id, None)
+        self.__advertised.pop(connection_id, None)
+        self.__grouped.discard(connection_id)
+        self.__members.pop(connection_id, None)
+        lost = self.outstanding.drop(connection_id)
+        cid = self.__connection_names.pop(connection_id, None)
+        if cid is None:
+            return
+
+        if self.__leave_group(cid, connection_id):
+            self.sessions.forget(connection_id)
+            self.__fail_over(cid, lost)
+            return
+
+        if cid in self.active_clients and self.active_clients[cid]["id"] == connection_id:
+            del self.active_clients[cid]
+            # A promoted client subscribes again once it is authorized
+            subscriptions = self.topics.subscriptions(cid)
+            self.topics.unsubscribe_all(cid)
+            self.registry.unregister(cid)
+            if self.__promote(cid):
+                self.sessions.forget(connection_id)
+                self.__fail_over(cid, lost)
                 return
+            self.sessions.hold(connection_id, subscriptions)
+            if self.cluster is not None:
+                self.cluster.leave(cid)
+            self.__fail_over(None, lost)
+
+        elif cid in self.on_hold_connections and self.on_hold_connections[cid]["id"] == connection_id:
+            del self.on_hold_connections[cid]
+
+    def __can_join(self, cid, connection_id):
+        # Both the new connection and the active one must have asked to join a group
+        return (
+            connection_id in self.pending_verification
+            and connection_id in self.__grouped
+            and cid in self.active_clients
+            and self.active_clients[cid]["id"] in self.__grouped
+        )
+
+    def __join_group(self, cid, client):
+        group = self.groups.get(cid)
+        if group is None:
+            group = self.groups[cid] = groups.ReplicaGroup(self.balancing)
+            active = self.active_clients[cid]
+            group.add(active, *self.__members.get(active["id"], (None, ())))
+        group.add({"client": client, "id": client["id"]}, *self.__members.get(client["id"], (None, ())))
+        logger.info("Client joined the group of local id %s with connection id %s, %s replicas" % (cid, client['id'], len(group)))
+
+    def __leave_group(self, cid, connection_id):
+        # Returns True if the connection was a replica and the group still has others
+        group = self.groups.get(cid)
+        if group is None or connection_id not in group:
+            return False
+        group.remove(connection_id)
+        if not group.replicas:
+            del self.groups[cid]
+            return False
+        if self.active_clients[cid]["id"] == connection_id:
+            # Another replica receives the messages which are not about a request
+            self.active_clients[cid] = group.replicas[0]
+            self.__register(cid, self.__advertised.get(group.replicas[0]["id"], ()))
+        if len(group) == 1:
+            del self.groups[cid]
+        return True
+
+    def __resume(self, client, payload, token):
+        # Restores the session held for the client if its token matches, see winerp.lib.sessions
+        cid = self.__connection_names[client["id"]]
+        session = self.sessions.resume(cid, token)
+        self.__send_authorized(client, payload, resumed=session is not None)
+        if session is None:
+            return
+        logger.info("Client resumed its session with connection id %s and local id %s, %s responses were buffered" % (client['id'], cid, len(session.responses)))
+        for pattern in session.subscriptions:
+            self.topics.subscribe(pattern, cid)
+        for header, body in session.responses:
+            self.__forward(client, header, body)
+
+    def __take_over(self, cid, token):
+        # The client reconnected before its previous connection was noticed to be lost,
+        # the previous connection is closed and the new one, on hold, is promoted
+        active = self.active_clients.get(cid)
+        if active is not None and self.sessions.owns(active["id"], token):
+            logger.info("Client reconnected, closing its previous connection with id %s and local id %s" % (active['id'], cid))
+            self.websocket.disconnect(active["client"], REPLACED, "Replaced by a newer connection")
 
-        for cid, each_client in self.on_hold_connections.items():
-            if each_client["id"] == client["address"][1]:
-                del self.on_hold_connections[cid]
+    def __fail_over(self, cid, lost):
+        # Sends the requests of a lost connection to the connection of ``cid`` taking its place,
+        # or fails them at once if they are not idempotent or nothing took its place, see winerp.lib.failover
+        for header, frames in lost:
+            if cid is None or frames is None:
+                self.__reject(header, "Destination disconnected.")
+            elif all(self.__deliver(cid, frame_header, body) for frame_header, body in frames):
+                self.metrics.request_replayed(header.get("route"))
+                logger.debug("Request Message sent again to %s" % cid)
+            else:
+                self.__reject(header, "Destination is overloaded.")
+
+    def __promote(self, cid):
+        standby = self.on_hold_connections.pop(cid, None)
+        if standby is None:
+            return False
+        logger.info("On Hold Client moved to active client with connection id %s and local id %s" % (standby['id'], cid))
+        self.active_clients[cid] = standby
+        self.__register(cid, self.__advertised.get(standby["id"], ()))
+        self.pending_verification.pop(standby["id"], None)
+        self.__send_authorized(standby["client"], MessagePayload())
+        return True
+
+    def __negotiate(self, connection_id, data):
+        # The client asks for a codec and a compression in the data of its verification,
+        # JSON without compression is used if the server can't serve them
+        if not isinstance(data, dict):
+            data = {}
+        codec = data.get("codec")
+        self.__codecs[connection_id] = codec if codec in self.codecs else binary.JSON
+        algorithm = data.get("compression")
+        if algorithm in self.compressions:
+            threshold = data.get("compression_threshold")
+            if isinstance(threshold, bool) or not isinstance(threshold, int) or threshold < 0:
+                threshold = 16384
+            self.__compressions[connection_id] = (algorithm, threshold)
+        if data.get("chunks"):
+            self.__chunked.add(connection_id)
+        if data.get("group"):
+            self.__grouped.add(connection_id)
+            shards = data.get("shards")
+            self.__members[connection_id] = (data.get("member"), shards if isinstance(shards, list) else ())
+        self.__advertise(connection_id, data)
+
+    def __advertise(self, connection_id, data):
+        # The routes are only registered while the connection is active
+        if isinstance(data.get("routes"), list):
+            self.__advertised[connection_id] = set(data["routes"])
+        if isinstance(data.get("coalesce"), list):
+            self.__coalescible[connection_id] = set(data["coalesce"])
+        if isinstance(data.get("idempotent"), list):
+            self.__idempotent[connection_id] = set(data["idempotent"])
+        name = self.__connection_names.get(connection_id)
+        if name in self.active_clients and self.active_clients[name]["id"] == connection_id:
+            self.__register(name, self.__advertised.get(connection_id, ()))
+
+    def __register(self, name, routes):
+        # The peers are told about the new routes of a name they already know
+        self.registry.register(name, routes)
+        if self.cluster is not None:
+            self.cluster.advertise(name, self.registry.routes(name))
+
+    def __resolve(self, route, requester):
+        # Returns the provider of a route for a request sent without a source,
+        # a client of this server if any, else a client of a peer
+        providers = self.registry.providers(route)
+        if self.cluster is not None:
+            providers += self.cluster.registry.providers(route)
+        for provider in providers:
+            if provider != requester and self.__is_connected(provider):
+                return provider
+        return None
+
+    def __send_authorized(self, client, payload, resumed=False):
+        payload.type = Payloads.success
+        payload.data = "Authorized."
+        message = payload.to_dict()
+        message["resume"] = self.sessions.issue(client["id"], self.__connection_names[client["id"]])
+        if resumed:
+            message["resumed"] = True
+        if client["id"] in self.__codecs:
+            message["codec"] = self.__codecs[client["id"]]
+            message["compression"] = self.__compressions.get(client["id"], (None,))[0]
+            message["batching"] = True
+        if client["id"] in self.__chunked:
+            message["chunks"] = True
+        self.__send_message(client, message)
+
+    def __attach(self, cluster: Cluster):
+        self.cluster = cluster
+        cluster.set_fn_local_names(self.active_clients.keys)
+        cluster.set_fn_local_routes(self.registry.routes)
+        cluster.set_fn_leave(self.__on_peer_leave)
+        cluster.set_fn_deliver(self.__on_peer_deliver)
+        self.websocket.set_fn_startup(cluster.start)
+
+    def __on_peer_leave(self, cid):
+        # The client disconnected from a peer, an on hold client of this server can take its place
+        if cid not in self.active_clients and self.__promote(cid):
+            self.cluster.join(cid, self.registry.routes(cid))
+
+    def __on_peer_deliver(self, targets, exclude, header, body):
+        if header["type"] == Payloads.request:
+            # Frames from a peer are only delivered to local clients, so they never bounce between peers
+            if targets[0] not in self.active_clients:
+                self.__reject(header, "Destination not found.")
+                return
+            # The requests are coalesced by the server of their destination, whichever server they come from
+            key = self.__coalesce(targets[0], header.get("route"), header.get("key"), body)
+            if key is not None and self.coalescer.join(key, header["destination"], header["uuid"]):
+                self.metrics.request_coalesced(header.get("route"))
                 return
+            if key is not None:
+                self.coalescer.start(key, header["uuid"])
+            if not self.__forward(self.__connection(targets[0], header)["client"], header, body):
+                self.coalescer.land(header["uuid"])
+                self.__reject(header, "Destination is overloaded.")
+            return
 
-        if client["address"][1] in self.pending_verification:
-            del self.pending_verification[client["address"][1]]
+        if header["type"] == Payloads.publication:
+            self.__publish(header, body, exclude)
+            return
+
+        if header["type"] in (Payloads.response, Payloads.error):
+            self.metrics.request_answered(header.get("uuid"))
+        if targets is None:
+            recipients = [
+                client_obj["client"]
+                for client_id, client_obj in self.active_clients.items()
+                if client_id != exclude
+            ]
+        else:
+            recipients = [
+                self.__connection(destination, header)["client"]
+                for destination in targets
+                if destination in self.active_clients
+            ]
+        self.__broadcast(recipients, header, body)
+
+    def __publish(self, header, body, exclude):
+        # Only the subscribers are looked up, whatever the number of connected clients
+        recipients = [
+            self.active_clients[name]["client"]
+            for name in self.topics.match(header["route"])
+            if name != exclude and name in self.active_clients
+        ]
+        self.__broadcast(recipients, header, body)
+
+    def __is_connected(self, cid):
+        return cid in self.active_clients or (self.cluster is not None and cid in self.cluster.locations)
+
+    def __deliver(self, cid, header, body):
+        if cid in self.active_clients:
+            return self.__forward(self.__connection(cid, header)["client"], header, body)
+        self.cluster.deliver([cid], header, body)
+        return True
+
+    def __connection(self, cid, header):
+        # The replica of a group a message is sent to, see winerp.lib.groups
+        group = self.groups.get(cid)
+        if group is None:
+            return self.active_clients[cid]
+        if header["type"] == Payloads.request:
+            replica = group.pick(header.get("uuid"), header.get("key"))
+            self.metrics.replica_request(cid, replica["id"])
+            return replica
+        return group.route(header.get("uuid")) or self.active_clients[cid]
+
+    def __reject(self, header, reason):
+        # Sends back an error for a request forwarded by a peer which could not be queued,
+        # or forwarded to a connection which was lost, to its requester and to the identical requests waiting for it
+        self.metrics.error(reason)
+        self.metrics.request_answered(header["uuid"])
+        error = MessagePayload(
+            type=Payloads.error,
+            id=header["id"],
+            destination=header["destination"],
+            uuid=header["uuid"],
+            data=reason,
+            traceback=reason
+        ).to_dict()
+        self.__fan_out(error, None)
+        if self.__is_connected(header["destination"]):
+            self.__deliver(header["destination"], error, None)
+        else:
+            self.sessions.buffer(header["destination"], error, None)
+
+    def __admit(self, client, kind):
+        # Replies are always queued, requests and informs are subject to the size of the queue
+        outbox = client["outbox"]
+        if kind not in (Payloads.request, Payloads.information, Payloads.publication) or not outbox.full:
+            return True
+        if self.overflow == "drop" and (outbox.evict(Payloads.information) or outbox.evict(Payloads.publication)):
+            return True
+
+        outbox.dropped += 1
+        if self.overflow == "disconnect":
+            logger.warning("Disconnecting slow client with connection id %s" % client["id"])
+            self.websocket.disconnect(client, OVERFLOW, "Too many messages queued")
+        else:
+            logger.debug("Queue of client with connection id %s is full" % client["id"])
+        return False
 
     def __send_message(self, client, message):
         if not isinstance(message, dict):
             message = message.to_dict()
-        self.websocket.send_message(
-            client,
-            orjson.dumps(message)
-        )
+        self.__push(client, self.__encode(client["id"], message, None), message["type"])
 
     def __send_error(self, client, payload):
-        if not isinstance(payload, dict):
-            payload = payload.to_dict()
+        self.metrics.error(payload.data)
+        self.__send_message(client, payload)
 
-        self.websocket.send_message(
-            client,
-            orjson.dumps(payload)
-        )
+    def __push(self, client, frame, kind):
+        self.metrics.sent(self.__connection_names.get(client["id"], "unverified"), kind, len(frame))
+        client["outbox"].push(frame, kind)
+
+    def __encode(self, connection_id, header, body):
+        # The body is only decoded when the destination uses another codec or compression than the sender.
+        # A codec of None stands for the legacy frames, a single JSON object.
+        codec = self.__codecs.get(connection_id)
+        if body is None:
+            if codec == binary.MSGPACK:
+                return binary.encode(header)
+            return envelope.encode(header) if codec is not None else orjson.dumps(header)
+
+        accepted = self.__compressions.get(connection_id)
+        algorithm = compression.algorithm_of(body)
+        body_codec = binary.MSGPACK if isinstance(body, binary.Packed) else binary.JSON
+        if algorithm is not None and (accepted is None or accepted[0] != algorithm or body_codec != codec):
+            body = self.__decompress(body, algorithm)
+            algorithm = None
+
+        if algorithm is None:
+            try:
+                if codec == binary.MSGPACK and body_codec != codec:
+                    body = binary.pack_body(orjson.loads(body))
+                elif codec != binary.MSGPACK and body_codec == binary.MSGPACK:
+                    body = binary.to_json(body)
+                if codec is None:
+                    return orjson.dumps({**header, **orjson.loads(body)})
+            except (TypeError, ValueError, OverflowError) as error:
+                raise EncodingError(str(error)) from error
+            if accepted is not None and len(body) > accepted[1]:
+                body = self.__compress(body, accepted[0])
+
+        if codec == binary.MSGPACK:
+            return binary.join(header, body)
+        return envelope.join(header, body)
+
+    def __compress(self, body, algorithm):
+        start = time.thread_time()
+        compressed = compression.compress(body, algorithm)
+        self.metrics.compression_time(algorithm, "compress", time.thread_time() - start)
+        self.metrics.compressed(algorithm, "server", compression.raw_size(compressed), len(compressed))
+        return compressed
+
+    def __decompress(self, body, algorithm):
+        start = time.thread_time()
+        body = compression.decompress(body)
+        self.metrics.compression_time(algorithm, "decompress", time.thread_time() - start)
+        return body
+
+    def __load(self, body):
+        # Decodes a raw body, for the few messages the server reads
+        algorithm = compression.algorithm_of(body)
+        if algorithm is not None:
+            body = self.__decompress(body, algorithm)
+        return binary.unpack_body(body) if isinstance(body, binary.Packed) else orjson.loads(body)
+
+    def __coalesce(self, destination, route, routing_key, body):
+        # Returns the key of a request to a coalescible route, None if it is not coalesced
+        connection = self.active_clients.get(destination)
+        if body is None or connection is None or route not in self.__coalescible.get(connection["id"], ()):
+            return None
+        return coalescing.key(destination, route, self.__load(body), routing_key)
+
+    def __fan_out(self, header, body):
+        # Sends the response of a coalesced request to the requests which waited for it,
+        # returns the body to send to the request which was forwarded
+        uuid = header.get("uuid")
+        waiters = self.coalescer.waiters(uuid)
+        if waiters and body is not None and chunks.is_chunk(body):
+            # Only the chunks of a response with waiters are decoded, to find the last one
+            meta = self.__load(body)[chunks.CHUNK_KEY]
+            if meta["seq"] == meta["count"] - 1:
+                self.coalescer.land(uuid)
+        else:
+            waiters = self.coalescer.land(uuid)
+        if waiters and body is not None and shm.is_handle(body):
+            # The first receiver would unlink the segment before the others map it
+            body = shm.keep(body)
+        for requester, request_uuid in waiters:
+            if self.__is_connected(requester):
+                self.__deliver(requester, dict(header, destination=requester, uuid=request_uuid), body)
+        return body
+
+    def __forward(self, client, header, body):
+        if not self.__admit(client, header["type"]):
+            return False
+        if body is not None and client["id"] not in self.__chunked and chunks.is_chunk(body):
+            # The client is sent the message once every chunk of it is received
+            body = self.assembler.add(client["id"], header, self.__load(body))
+            if body is None:
+                return True
+        try:
+            frame = self.__encode(client["id"], header, body)
+        except EncodingError as error:
+            # The requester is sent an error rather than waiting for a message which can't be sent
+            logger.warning("Message can't be encoded for connection id %s: %s" % (client["id"], error))
+            if header.get("uuid") is not None and header["type"] != Payloads.information:
+                self.__reject(header, "Message can't be encoded for its destination.")
+            return True
+        if header["type"] == Payloads.request:
+            route = header.get("route")
+            self.outstanding.track(client["id"], header, body, (
+                route in self.__idempotent.get(client["id"], ())
+                or route in self.__coalescible.get(client["id"], ())
+            ))
+        self.__push(client, frame, header["type"])
+        return True
+
+    def __broadcast(self, clients, header, body):
+        # Each frame is encoded once and the same buffer is sent to every recipient
+        frames = {}
+        chunk = body is not None and chunks.is_chunk(body)
+        for client in clients:
+            if chunk and client["id"] not in self.__chunked:
+                self.__forward(client, header, body)
+                continue
+            key = (self.__codecs.get(client["id"]), self.__compressions.get(client["id"]))
+            if key not in frames:
+                try:
+                    frames[key] = self.__encode(client["id"], header, body)
+                except EncodingError as error:
+                    logger.warning("Message can't be encoded for connection id %s: %s" % (client["id"], error))
+                    frames[key] = None
+            if frames[key] is not None and self.__admit(client, header["type"]):
+                self.__push(client, frames[key], header["type"])
 
     def __on_message(self, client, _, msg):
-        msg = WsMessage(orjson.loads(msg))
-        payload = MessagePayload().from_message(msg)
+        header, body = binary.split(msg) if binary.is_binary(msg) else envelope.split(msg)
+        if header.get("type") != Payloads.batch:
+            # The frames of a batch are counted one by one
+            self.metrics.received(self.__connection_names.get(client["id"], "unverified"), header.get("type"), len(msg))
+        algorithm = compression.algorithm_of(body)
+        if algorithm is not None:
+            self.metrics.compressed(algorithm, "client", compression.raw_size(body), len(body))
+        msg = WsMessage(header)
+        payload = MessagePayload(**header)
         if msg.type.verification:
-            if msg.id in self.active_clients:
-                logger.info("Connection from duplicate client has benn put on hold connection id %s and local id %s" % (client['address'][1], msg.id))
+            data = orjson.loads(body).get("data") if body is not None else None
+            if body is not None:
+                self.__negotiate(client["id"], data)
+            token = data.get("resume") if isinstance(data, dict) else None
+            if self.__can_join(msg.id, client["id"]):
+                self.__connection_names[client["id"]] = msg.id
+                del self.pending_verification[client["id"]]
+                self.__join_group(msg.id, client)
+                self.__send_authorized(client, payload)
+
+            elif self.__is_connected(msg.id):
+                logger.info("Connection from duplicate client has benn put on hold connection id %s and local id %s" % (client['id'], msg.id))
                 payload.uuid = None
                 payload.type = Payloads.error
                 payload.data = "Already authorized."
                 payload.traceback = "Already authorized."
                 self.__send_error(client, payload)
-                self.on_hold_connections[msg.id] = {"client": client, "id": client["address"][1]}
-
-            elif client["address"][1] in self.pending_verification:
-                logger.info("Client verified with connection id %s and local id %s" % (client['address'][1], msg.id))
-                self.active_clients[msg.id] = {"client": client, "id": client["address"][1]}
-                del self.pending_verification[client["address"][1]]
-                payload.type = Payloads.success
-                payload.data = "Authorized."
-                self.__send_message(client, payload)
+                self.on_hold_connections[msg.id] = {"client": client, "id": client["id"]}
+                self.__connection_names[client["id"]] = msg.id
+                self.__take_over(msg.id, token)
+
+            elif client["id"] in self.pending_verification:
+                logger.info("Client verified with connection id %s and local id %s" % (client['id'], msg.id))
+                self.active_clients[msg.id] = {"client": client, "id": client["id"]}
+                self.__connection_names[client["id"]] = msg.id
+                del self.pending_verification[client["id"]]
+                self.registry.register(msg.id, self.__advertised.get(client["id"], ()))
+                if self.cluster is not None:
+                    self.cluster.join(msg.id, self.registry.routes(msg.id))
+                self.__resume(client, payload, token)
         else:
-            if client["address"][1] in self.pending_verification:
+            if client["id"] in self.pending_verification:
                 logger.info('Unverified client tried to send message')
                 payload.type = Payloads.error
                 payload.data = "Not authorized."
@@ -129,24 +730,86 @@ class Server:
                 self.__send_error(client, payload)
                 return
 
+        group = self.groups.get(msg.id)
+        if group is not None and client["id"] in group:
+            # The messages about a request sent by a replica, like its response, are sent back to it
+            group.bind(msg.uuid, client["id"])
+
+        if msg.type.batch:
+            logger.debug("Received Batch Message from client %s" % client['id'])
+            for frame in self.__load(body)["data"]:
+                self.__on_message(client, _, frame)
+            return
+
         if msg.type.information:
-            logger.debug("Received Information Message from client %s" % client['address'][1])
-            payload.type = Payloads.information
+            logger.debug("Received Information Message from client %s" % client['id'])
+            header["type"] = Payloads.information
+            # The destination is left out so every recipient shares the same frame
+            header["destination"] = None
             if msg.route:
-                for destination in msg.route:
-                    if destination in self.active_clients:
-                        payload.destination = destination
-                        self.__send_message(self.active_clients[destination]["client"], payload)
+                recipients = [
+                    self.active_clients[destination]["client"]
+                    for destination in msg.route
+                    if destination in self.active_clients
+                ]
+                if self.cluster is not None:
+                    self.cluster.deliver(msg.route, header, body)
             else:
-                for client_id, client_obj in self.active_clients.items():
-                    if client_id != payload.id:
-                        payload.destination = client_id
-                        self.__send_message(client_obj["client"], payload)
+                recipients = [
+                    client_obj["client"]
+                    for client_id, client_obj in self.active_clients.items()
+                    if client_id != msg.id
+                ]
+                if self.cluster is not None:
+                    self.cluster.broadcast(header, body, exclude=msg.id)
+            self.__broadcast(recipients, header, body)
+
+        if msg.type.advertisement:
+            logger.debug("Received Advertisement Message from client %s" % client['id'])
+            data = (header if body is None else self.__load(body)).get("data")
+            self.__advertise(client["id"], data if isinstance(data, dict) else {})
+
+        if msg.type.subscription:
+            logger.debug("Received Subscription Message from client %s" % client['id'])
+            data = (header if body is None else self.__load(body)).get("data") or {}
+            for action, update in (("subscribe", self.topics.subscribe), ("unsubscribe", self.topics.unsubscribe)):
+                for pattern in data.get(action) or ():
+                    try:
+                        validate_topic(pattern)
+                    except ValueError as error:
+                        logger.debug("Ignored topic %r of client %s: %s" % (pattern, client['id'], error))
+                        continue
+                    update(pattern, msg.id)
+
+        if msg.type.publication:
+            logger.debug("Received Publication Message from client %s" % client['id'])
+            try:
+                validate_topic(msg.route, wildcards=False)
+            except ValueError as error:
+                logger.debug("Ignored publication of client %s: %s" % (client['id'], error))
+                return
+            # The destination is left out so every subscriber shares the same frame
+            header["destination"] = None
+            self.__publish(header, body, exclude=msg.id)
+            if self.cluster is not None:
+                self.cluster.broadcast(header, body, exclude=msg.id)
+
+        if msg.type.invalidation:
+            logger.debug("Received Invalidation Message from client %s" % client['id'])
+            header["destination"] = None
+            recipients = [
+                client_obj["client"]
+                for client_id, client_obj in self.active_clients.items()
+                if client_id != msg.id
+            ]
+            if self.cluster is not None:
+                self.cluster.broadcast(header, body, exclude=msg.id)
+            self.__broadcast(recipients, header, body)
 
         if msg.type.ping:
-            logger.debug("Received Ping Message from client %s" % client['address'][1])
+            logger.debug("Received Ping Message from client %s" % client['id'])
             payload.type = Payloads.ping
-            if (msg.destination is not None and msg.destination in self.active_clients) or msg.destination is None:
+            if msg.destination is None or self.__is_connected(msg.destination):
                 payload.data = {"success": True}
             else:
                 payload.data = {"success": False}
@@ -157,49 +820,139 @@ class Server:
             )
 
         if msg.type.request:
-            logger.debug("Received Request Message from client %s" % client['address'][1])
-            if msg.id == msg.destination:
+            logger.debug("Received Request Message from client %s" % client['id'])
+            if msg.destination is None and msg.route is not None:
+                header["destination"] = self.__resolve(msg.route, msg.id)
+
+            if msg.destination is None:
+                payload.type = Payloads.error
+                payload.data = "No client provides this route."
+                payload.traceback = "No client provides this route."
+                self.__send_error(client, payload)
+
+            elif msg.id == msg.destination:
                 payload.type = Payloads.error
                 payload.data = "Source and destination are the same."
                 payload.traceback = "Source and destination are the same."
                 self.__send_error(client, payload)
 
-            elif msg.destination not in self.active_clients:
+            elif not self.__is_connected(msg.destination):
                 payload.type = Payloads.error
                 payload.data = "Destination not found."
                 payload.traceback = "Destination not found."
                 self.__send_error(client, payload)
 
             else:
-                payload.type = Payloads.request
-                payload.id = msg.destination
-                payload.destination = msg.id
-                self.__send_message(
-                    self.active_clients[msg.destination]["client"],
-                    payload
-                )
-                logger.debug("Request Message Forwarded to %s" % self.active_clients[msg.destination]["client"]['address'][1])
-
-        if msg.type.response or msg.type.error or msg.type.function_call:
-            logger.debug("Received Response Message from client %s" % client['address'][1])
-            if msg.destination not in self.active_clients:
+                destination = msg.destination
+                key = self.__coalesce(destination, msg.route, header.get("key"), body)
+                if key is not None and self.coalescer.join(key, msg.id, msg.uuid):
+                    self.metrics.request_coalesced(msg.route)
+                    logger.debug("Request Message coalesced with an identical request to %s" % destination)
+                    return
+                header["type"] = Payloads.request
+                header["id"], header["destination"] = destination, msg.id
+                if key is not None:
+                    # Started before the request is forwarded, so an error sent back meanwhile lands it
+                    self.coalescer.start(key, msg.uuid)
+                if self.__deliver(destination, header, body):
+                    self.metrics.request_forwarded(msg.uuid, msg.route)
+                    logger.debug("Request Message Forwarded to %s" % destination)
+                else:
+                    self.coalescer.land(msg.uuid)
+                    payload.type = Payloads.error
+                    payload.data = "Destination is overloaded."
+                    payload.traceback = "Destination is overloaded."
+                    self.__send_error(client, payload)
+
+        if msg.type.response or msg.type.error or msg.type.function_call or msg.type.stream:
+            logger.debug("Received Response Message from client %s" % client['id'])
+            if msg.type.response or msg.type.error:
+                self.outstanding.answered(msg.uuid)
+            if not self.__is_connected(msg.destination):
+                if self.sessions.buffer(msg.destination, header, body):
+                    logger.debug("Response buffered for the session of %s" % msg.destination)
+                    return
                 payload.type = Payloads.error
                 payload.data = "The data requester is no longer connected"
                 payload.traceback = "The data requester is no longer connected"
                 self.__send_error(client, payload)
+                return
 
-            payload.type = Payloads.response if msg.type.response else (
-                Payloads.function_call if msg.type.function_call else Payloads.error)
-
-            self.__send_message(
-                self.active_clients[msg.destination]["client"],
-                payload
-            )
-            logger.debug("Response forwarded to %s" % self.active_clients[msg.destination]["client"]['address'][1])
+            if msg.type.response or msg.type.error:
+                self.metrics.request_answered(msg.uuid)
+                if group is not None:
+                    group.answered(msg.uuid)
+                body = self.__fan_out(header, body)
+            self.__deliver(msg.destination, header, body)
+            logger.debug("Response forwarded to %s" % msg.destination)
 
     def start(self):
         """
         Starts the server on the given port.
         """
         logger.info("Started Websocket Server")
+        if self.workers > 1:
+            self.__run_workers()
+        else:
+            self.__dump_metrics(self.metrics_path)
+            self.websocket.run_forever()
+
+    def __dump_metrics(self, path):
+        if self.metrics_interval is None:
+            return
+        threading.Thread(target=self.__metrics_dumper, args=(path,), daemon=True).start()
+
+    def __metrics_dumper(self, path):
+        while True:
+            time.sleep(self.metrics_interval)
+            snapshot = self.metrics.render()
+            if path is None:
+                sys.stdout.write(snapshot)
+                sys.stdout.flush()
+            else:
+                with open(path + ".tmp", "w") as file:
+                    file.write(snapshot)
+                os.replace(path + ".tmp", path)
+
+    def __run_workers(self):
+        socket_dir = tempfile.mkdtemp(prefix="winerp-")
+        processes = [
+            multiprocessing.Process(
+                target=_run_worker,
+                args=(self.__options, WorkerCluster(index, self.workers, socket_dir)),
+                name="winerp-worker-%s" % index
+            )
+            for index in range(self.workers)
+        ]
+        try:
+            for process in processes:
+                process.start()
+            # Stopping the supervisor with SIGTERM stops the workers as well.
+            # The handler is installed once the workers are forked, so they don't inherit it
+            signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+                process.join()
+            shutil.rmtree(socket_dir, ignore_errors=True)
+
+    def _start_worker(self, cluster: WorkerCluster):
+        """
+        Serves the port as one of the worker processes of ``cluster``.
+        """
+        self.__attach(cluster)
+        self.websocket.reuse_port = True
+        logger.info("Started worker %s" % cluster.index)
+        self.__dump_metrics(None if self.metrics_path is None else "%s.%s" % (self.metrics_path, cluster.name))
         self.websocket.run_forever()
+
+
+def _run_worker(options, cluster):
+    # A worker is stopped by SIGTERM, whatever handler the process it was forked from had
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    Server(**options)._start_worker(cluster)